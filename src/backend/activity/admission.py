@@ -0,0 +1,161 @@
+"""Admission control for /detect: bounded work, deadlines and degraded modes.
+
+At most DETECT_MAX_IN_FLIGHT requests decode and run detection at once, and
+at most DETECT_MAX_QUEUE more wait for a slot. Anything beyond that is
+turned away at once with 503 and Retry-After, before its upload is even
+parsed, so a burst can't pile full-resolution images onto request threads.
+
+Every admitted request carries a deadline: the client's own budget from
+the X-Request-Timeout-Ms header, capped by DETECT_TIMEOUT_MS. A request
+whose deadline passes while it waits for a slot, or while its frame sits
+in the batch queue, is dropped with 504 instead of running inference for a
+client that has already given up.
+
+Under pressure (in-flight plus queued above DETECT_DEGRADE_AT of capacity)
+requests can run degraded, per DETECT_DEGRADE ("size", "confidence" or
+both): frames letterboxed to DETECT_DEGRADED_SIZE instead of the full
+model input, and/or candidates under DETECT_DEGRADED_CONFIDENCE dropped
+before NMS. Degraded responses say so in an X-Degraded header. "size" is
+ignored for a model exported at a fixed input size, which would only scale
+the smaller frames back up.
+
+/detect/stream frames are admitted one at a time, without queueing: a frame
+that finds no free slot is skipped, and the stream keeps tracking.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from activity.ingest import INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = int(os.environ.get("DETECT_MAX_IN_FLIGHT", 16))
+MAX_QUEUE = int(os.environ.get("DETECT_MAX_QUEUE", 32))
+TIMEOUT_MS = float(os.environ.get("DETECT_TIMEOUT_MS", 10_000))
+RETRY_AFTER = int(os.environ.get("DETECT_RETRY_AFTER", 1))
+DEGRADE = tuple(mode for mode in os.environ.get("DETECT_DEGRADE", "").split(",") if mode)
+DEGRADE_AT = float(os.environ.get("DETECT_DEGRADE_AT", 0.75))
+# A multiple of 32, as YOLO strides need
+DEGRADED_SIZE = int(os.environ.get("DETECT_DEGRADED_SIZE", 416))
+DEGRADED_CONFIDENCE = float(os.environ.get("DETECT_DEGRADED_CONFIDENCE", 0.5))
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+DEGRADE_MODES = ("size", "confidence")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def request_deadline(headers, timeout_ms=TIMEOUT_MS):
+    """Monotonic deadline from the client's budget header, capped by `timeout_ms`"""
+    budgets = [timeout_ms] if timeout_ms > 0 else []
+    try:
+        budgets.append(float(headers.get(DEADLINE_HEADER)))
+    except (TypeError, ValueError):  # Missing or malformed: the server's own timeout applies
+        pass
+    return time.monotonic() + min(budgets) / 1000 if budgets else None
+
+
+class Ticket:
+    """One admitted request: its deadline and how (if at all) to degrade it"""
+
+    def __init__(self, deadline, degraded=()):
+        self.deadline = deadline
+        self.degraded = degraded
+        self.size = DEGRADED_SIZE if "size" in degraded else INPUT_SIZE
+        self.confidence = DEGRADED_CONFIDENCE if "confidence" in degraded else None
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise DeadlineExceeded("Request deadline passed")
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_queue=MAX_QUEUE, degrade=DEGRADE, degrade_at=DEGRADE_AT):
+        unknown = set(degrade) - set(DEGRADE_MODES)
+        if unknown:
+            raise ValueError(f"Unknown DETECT_DEGRADE mode(s) {', '.join(sorted(unknown))}")
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.degrade = tuple(degrade)
+        self.degrade_at = degrade_at
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.degraded = 0
+
+    def acquire(self, deadline=None, wait=True):
+        """Take a slot and return its Ticket; release() gives it back. Raises
+        Overloaded, or DeadlineExceeded while queued. Without `wait`, a caller
+        that would have to queue is turned away at once"""
+        with self.cond:
+            if self.in_flight >= self.max_in_flight:
+                if not wait or self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise Overloaded("Detection queue is full")
+                self.waiting += 1
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise DeadlineExceeded("Request deadline passed while queued")
+                        self.cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            load = (self.in_flight + self.waiting) / (self.max_in_flight + self.max_queue)
+            degraded = self.degrade if self.degrade and load >= self.degrade_at else ()
+            if degraded:
+                self.degraded += 1
+        return Ticket(deadline, degraded)
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+
+    @contextmanager
+    def admit(self, deadline=None):
+        """Hold a slot for the body of the `with`; raises Overloaded or DeadlineExceeded"""
+        ticket = self.acquire(deadline)
+        try:
+            yield ticket
+        finally:
+            self.release()
+
+    def disable(self, mode, reason):
+        """Stop degrading in `mode`, e.g. when the model can't benefit from it"""
+        if mode in self.degrade:
+            logger.warning("Ignoring DETECT_DEGRADE=%s: %s", mode, reason)
+            self.degrade = tuple(m for m in self.degrade if m != mode)
+
+    def count_expired(self):
+        """Count a request dropped for its deadline, wherever that happened"""
+        with self.cond:
+            self.expired += 1
+
+    def stats(self):
+        with self.cond:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "degraded": self.degraded,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "degrade": list(self.degrade),
+            }
@@ -1,52 +1,64 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import cv2
-import numpy as np
-from ultralytics import YOLO
+import os
+import sys
+
+try:
+    from flask_sock import Sock
+except ImportError:  # The streaming endpoint needs flask-sock
+    Sock = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from activity.ingest import load_message, load_upload, request_limit
+from activity.pipeline import DetectionPipeline
+from activity.stream import serve
+from metrics import instrument, stage
+from warmup import WarmUp, add_ready_route
 
 app = Flask(__name__)
 CORS(app)
+instrument(app)  # Route and stage latencies on /metrics
+app.config["MAX_CONTENT_LENGTH"] = request_limit()
 
-# Load YOLOv8 model
-model = YOLO("yolov8n.pt")
+# The YOLOv8 detector: PyTorch yolov8n.pt by default, or an exported
+# ONNX / OpenVINO model (DETECT_BACKEND / DETECT_MODEL / DETECT_THREADS),
+# behind admission control, a result cache and the batcher; see
+# activity/pipeline.py. Loaded on first use, or by the warm-up, which
+# /ready waits for (WARMUP=0 to skip)
+detection = DetectionPipeline()
+detection.register_metrics()
+warmup = WarmUp()
+add_ready_route(app, warmup)
 
-# Food categories
-CATEGORIES = {
-    "Vitamin A": ["carrot", "mango", "spinach", "apple", "papaya", "sweet potato", "red bell pepper", "cantaloupe", "butternut squash", "kale"],
-    "Vitamin B": ["banana", "egg", "milk", "avocado", "legumes", "chicken", "fish", "nuts", "whole grains", "sunflower seeds"],
-    "Vitamin C": ["orange", "lemon", "strawberry", "kiwi", "pineapple", "papaya", "mango", "broccoli", "brussels sprouts", "bell peppers"],
-    "Minerals": ["broccoli", "kale", "spinach", "cauliflower", "mushrooms", "peas", "lentils", "potatoes", "nuts", "seeds"],
-    "Macronutrients": ["almond", "cashew", "walnut", "peanut", "pumpkin seeds", "chia seeds", "oats", "brown rice", "quinoa", "whole wheat bread","Tomato"]
-}
+@warmup.step("detector")
+def warm_detector():
+    detection.warm_up()
 
 @app.route("/detect", methods=["POST"])
 def detect_objects():
-    file = request.files["image"]
-    np_img = np.frombuffer(file.read(), np.uint8)
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-
-    results = model(img)
-    detections = []
-
-    for r in results:
-        for box in r.boxes:
-            class_id = int(box.cls)
-            name = r.names[class_id]
-            confidence = float(box.conf)
-            detections.append({"name": name, "confidence": confidence})
-
-    response = {}
-    for category, items in CATEGORIES.items():
-        matched = [
-            {"item": d["name"], "confidence": d["confidence"]}
-            for d in detections if d["name"] in items
-        ]
-        response[category.lower().replace(" ", "_")] = {
-            "detected": len(matched) > 0,
-            "details": matched,
-        }
-
-    return jsonify(response)
+    def load_frame(size):
+        with stage("upload"):
+            file = request.files.get("image")
+        if file is None:
+            raise ValueError("No image provided. Send it as the 'image' file field")
+        return load_upload(file, size)  # Decoded at reduced size and letterboxed for the model
+
+    # Errors, shedding and deadlines map to responses in DetectionPipeline.handle
+    return detection.handle(request.headers, load_frame)
+
+@app.route("/detect/stats", methods=["GET"])
+def detect_stats():
+    return jsonify(detection.stats())
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/detect/stream")
+    def detect_stream(ws):
+        """Live detection over a WebSocket; see activity/stream.py for the protocol"""
+        serve(ws, detection.stream_session(), load_message)
+
+warmup.start()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""Detector backends for CPU-only nodes.
+
+Every backend is a `predict(images, confidence)` function with the same
+contract as inference.yolo_predict: a list of letterboxed BGR frames (all
+the same size) in, a list of {"name", "confidence", "box"} detections per
+frame out, keeping candidates above `confidence`. DETECT_BACKEND picks
+one at startup:
+
+    torch     ultralytics + PyTorch on DETECT_MODEL (default yolov8n.pt)
+    onnx      ONNX Runtime on an exported .onnx file
+    openvino  OpenVINO on an exported .xml IR
+    stub      no model: fixed detections after DETECT_STUB_MS, for benchmarks
+
+DETECT_THREADS caps intra-op threads (0 leaves the runtime default).
+Exported models, FP32 or INT8, come from the CLI:
+
+    python -m activity.backends --format openvino --int8 --calibration photos/
+"""
+import argparse
+import ast
+import glob
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+from activity.ingest import INPUT_SIZE, letterbox, load_upload
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.environ.get("DETECT_BACKEND", "torch")
+MODEL_PATH = os.environ.get("DETECT_MODEL", "")
+THREADS = int(os.environ.get("DETECT_THREADS", 0))
+STUB_MS = float(os.environ.get("DETECT_STUB_MS", 25))
+
+# Same defaults as ultralytics so every backend reports the same boxes
+CONFIDENCE = 0.25
+NMS_IOU = 0.7
+MAX_DETECTIONS = 300
+
+DEFAULT_MODELS = {
+    "torch": "yolov8n.pt",
+    "onnx": "yolov8n.onnx",
+    "openvino": "yolov8n_openvino_model/yolov8n.xml",
+    "stub": "",
+}
+STUB_ITEMS = ("apple", "banana", "broccoli", "carrot", "orange")
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def load_backend(name=BACKEND, path=MODEL_PATH, threads=THREADS):
+    """Build the configured backend's predict function"""
+    loaders = {"torch": torch_backend, "onnx": onnx_backend, "openvino": openvino_backend, "stub": stub_backend}
+    if name not in loaders:
+        raise ValueError(f"Unknown DETECT_BACKEND {name!r}, expected one of {', '.join(loaders)}")
+    path = path or DEFAULT_MODELS[name]
+    logger.info("Loading %s detector from %s", name, path)
+    return loaders[name](path, threads)
+
+
+def torch_backend(path, threads=0):
+    import torch
+    from ultralytics import YOLO
+
+    from activity.inference import yolo_predict
+
+    if threads:
+        torch.set_num_threads(threads)
+    return yolo_predict(YOLO(path))
+
+
+def onnx_backend(path, threads=0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    names = parse_names(session.get_modelmeta().custom_metadata_map.get("names"))
+    model_input = session.get_inputs()[0]
+    batch, _, height, _ = model_input.shape
+
+    def run(blob):
+        return session.run(None, {model_input.name: blob})[0]
+
+    return exported_predict(run, names, dynamic_batch=not isinstance(batch, int),
+                            input_size=height if isinstance(height, int) else None)
+
+
+def openvino_backend(path, threads=0):
+    import openvino as ov
+
+    config = {"PERFORMANCE_HINT": "LATENCY"}
+    if threads:
+        config["INFERENCE_NUM_THREADS"] = threads
+    core = ov.Core()
+    model = core.read_model(path)
+    shape = model.inputs[0].get_partial_shape()
+    compiled = core.compile_model(model, "CPU", config)
+    names = parse_names(metadata_names(os.path.dirname(path)))
+    output = compiled.outputs[0]
+
+    def run(blob):
+        return compiled(blob)[output]
+
+    return exported_predict(run, names, dynamic_batch=shape[0].is_dynamic,
+                            input_size=None if shape[2].is_dynamic else shape[2].get_length())
+
+
+def stub_backend(path="", threads=0, latency_ms=STUB_MS):
+    """Stand-in detector with a fixed cost per call; detections depend on the frame only"""
+    def predict(images, confidence=CONFIDENCE):
+        # Batches are cheaper per image, and smaller frames cheaper per
+        # pixel, roughly as on a real CPU model
+        pixels = images[0].shape[0] * images[0].shape[1] / INPUT_SIZE ** 2
+        time.sleep(latency_ms / 1000 * pixels * (1 + 0.25 * (len(images) - 1)))
+        results = []
+        for img in images:
+            h, w = img.shape[:2]
+            seed = int(img[::max(1, h // 8), ::max(1, w // 8)].sum())
+            results.append([
+                {"name": STUB_ITEMS[(seed + i) % len(STUB_ITEMS)], "confidence": 0.5 + 0.1 * i,
+                 "box": [w * 0.1 * i, h * 0.1 * i, w * (0.5 + 0.1 * i), h * (0.5 + 0.1 * i)]}
+                for i in range(1 + seed % 3) if 0.5 + 0.1 * i > confidence
+            ])
+        return results
+    return predict
+
+
+def exported_predict(run, names, dynamic_batch=True, input_size=None):
+    """Wrap a raw (batch, 4 + classes, anchors) YOLOv8 graph as a predict function.
+
+    `input_size` is the side of a fixed-size graph, None if it takes any size.
+    """
+    def predict(images, confidence=CONFIDENCE):
+        size = images[0].shape[0]
+        graph_size = input_size or size
+        if graph_size != size:
+            # A fixed-size graph still needs its own size; boxes are scaled back below
+            images = [letterbox(img, graph_size) for img in images]
+        if dynamic_batch:
+            outputs = run(to_blob(images))
+        else:
+            # Static exports take one frame at a time
+            outputs = np.concatenate([run(to_blob([img])) for img in images])
+        detections = [postprocess(out, names, confidence, size=graph_size) for out in outputs]
+        if graph_size != size:
+            for frame in detections:
+                for d in frame:
+                    d["box"] = [v * size / graph_size for v in d["box"]]
+        return detections
+    predict.input_size = input_size  # Lets callers see that smaller frames save nothing
+    return predict
+
+
+def to_blob(images):
+    """Letterboxed BGR uint8 frames to the NCHW float RGB batch YOLO expects"""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255
+
+
+def postprocess(output, names, confidence=CONFIDENCE, nms_iou=NMS_IOU, size=INPUT_SIZE):
+    """Decode one frame's raw predictions, with per-class NMS"""
+    preds = output.T  # anchors x (cx, cy, w, h, class scores...)
+    scores = preds[:, 4:]
+    classes = scores.argmax(1)
+    conf = scores.max(1)
+    keep = conf > confidence
+    preds, classes, conf = preds[keep], classes[keep], conf[keep]
+    if not len(preds):
+        return []
+    xywh = preds[:, :4].copy()
+    xywh[:, :2] -= xywh[:, 2:] / 2
+    kept = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), classes.tolist(), confidence, nms_iou)
+    kept = sorted(np.asarray(kept).flatten(), key=lambda i: -conf[i])[:MAX_DETECTIONS]
+    boxes = np.clip(np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]], axis=1), 0, size)
+    return [
+        {
+            "name": names.get(int(classes[i]), str(int(classes[i]))),
+            "confidence": float(conf[i]),
+            "box": boxes[i].tolist(),
+        }
+        for i in kept
+    ]
+
+
+def parse_names(value):
+    """Class names from ultralytics export metadata ("{0: 'person', ...}")"""
+    if not value:
+        return {}
+    names = ast.literal_eval(value) if isinstance(value, str) else value
+    return {int(k): v for k, v in names.items()}
+
+
+def metadata_names(model_dir):
+    path = os.path.join(model_dir, "metadata.yaml")
+    if not os.path.exists(path):
+        return None
+    import yaml
+
+    with open(path) as f:
+        return (yaml.safe_load(f) or {}).get("names")
+
+
+def image_files(directory):
+    return sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(directory, pattern)))
+
+
+def load_frames(directory, limit=None, size=INPUT_SIZE):
+    """Decode a directory of photos exactly as /detect would"""
+    frames = []
+    for path in image_files(directory)[:limit]:
+        with open(path, "rb") as f:
+            frames.append(load_upload(f, size))
+    if not frames:
+        raise ValueError(f"No images found in {directory}")
+    return frames
+
+
+def export(weights, fmt, out=None, int8=False, calibration=None, samples=300, size=INPUT_SIZE):
+    """Export `weights` to ONNX or OpenVINO; INT8 is calibrated on local photos"""
+    from ultralytics import YOLO
+
+    if int8 and not calibration:
+        raise ValueError("INT8 export needs --calibration with representative photos")
+    exported = YOLO(weights).export(format=fmt, imgsz=size, dynamic=(fmt == "onnx"))
+    if fmt == "openvino":
+        exported = glob.glob(os.path.join(exported, "*.xml"))[0]
+    if not int8:
+        return exported
+
+    frames = load_frames(calibration, samples, size)
+    stem, ext = os.path.splitext(exported)
+    target = out or f"{stem}-int8{ext}"
+    if fmt == "onnx":
+        quantize_onnx(exported, target, frames)
+    else:
+        quantize_openvino(exported, target, frames)
+    return target
+
+
+def quantize_onnx(source, target, frames):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class Frames(CalibrationDataReader):
+        def __init__(self, name):
+            self.batches = iter({name: to_blob([img])} for img in frames)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(
+        source, target, Frames(input_name),
+        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8, per_channel=True,
+    )
+    # Keep the class names that ultralytics stored on the FP32 export
+    import onnx
+
+    fp32, int8 = onnx.load(source), onnx.load(target)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, target)
+
+
+def quantize_openvino(source, target, frames):
+    import nncf
+    import openvino as ov
+
+    model = ov.Core().read_model(source)
+    # The detection head's concat/arithmetic stays in float, as ultralytics does
+    quantized = nncf.quantize(
+        model, nncf.Dataset(frames, lambda img: to_blob([img])),
+        preset=nncf.QuantizationPreset.MIXED, subset_size=len(frames),
+    )
+    if os.path.dirname(target) != os.path.dirname(source):
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        metadata = os.path.join(os.path.dirname(source), "metadata.yaml")
+        if os.path.exists(metadata):
+            with open(metadata) as src, open(os.path.join(os.path.dirname(target), "metadata.yaml"), "w") as dst:
+                dst.write(src.read())
+    ov.save_model(quantized, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the food detector for a CPU backend")
+    parser.add_argument("--weights", default=DEFAULT_MODELS["torch"], help="PyTorch weights (default: %(default)s)")
+    parser.add_argument("--format", choices=("onnx", "openvino"), required=True)
+    parser.add_argument("--int8", action="store_true", help="quantize to INT8 after export")
+    parser.add_argument("--calibration", help="directory of representative photos for INT8 calibration")
+    parser.add_argument("--samples", type=int, default=300, help="calibration photos to use (default: %(default)s)")
+    parser.add_argument("--out", help="output path for the INT8 model")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = export(args.weights, args.format, args.out, args.int8, args.calibration, args.samples)
+    print(f"Exported {path} in {time.perf_counter() - start:.1f}s; "
+          f"run with DETECT_BACKEND={args.format} DETECT_MODEL={path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Food categories reported by /detect"""
+
+CATEGORIES = {
+    "Vitamin A": ["carrot", "mango", "spinach", "apple", "papaya", "sweet potato", 
+                 "red bell pepper", "cantaloupe", "butternut squash", "kale"],
+    "Vitamin B": ["banana", "egg", "milk", "avocado", "legumes", "chicken", 
+                 "fish", "nuts", "whole grains", "sunflower seeds"],
+    "Vitamin C": ["orange", "lemon", "strawberry", "kiwi", "pineapple", "papaya", 
+                 "mango", "broccoli", "brussels sprouts", "bell peppers"],
+    "Minerals": ["broccoli", "kale", "spinach", "cauliflower", "mushrooms", 
+                "peas", "lentils", "potatoes", "nuts", "seeds"],
+    "Macronutrients": ["almond", "cashew", "walnut", "peanut", "pumpkin seeds", 
+                      "chia seeds", "oats", "brown rice", "quinoa", "whole wheat bread", "tomato"]
+}
+
+
+def categorize(detections):
+    """Group detections into the per-category response"""
+    detections = [
+        {"name": d["name"].lower(), "confidence": d["confidence"]}  # Lowercase for matching
+        for d in detections
+    ]
+    response = {}
+    for category, items in CATEGORIES.items():
+        matched = [
+            {"item": d["name"], "confidence": d["confidence"]}
+            for d in detections if d["name"] in [item.lower() for item in items]
+        ]
+        response[category.lower().replace(" ", "_")] = {
+            "detected": len(matched) > 0,
+            "details": matched,
+        }
+    return response
@@ -0,0 +1,155 @@
+"""Check exported / quantized detectors against the FP32 PyTorch baseline.
+
+Runs every backend over a directory of local photos, decoded exactly as
+/detect decodes them, and reports per candidate:
+
+  * detection recall and precision against the baseline (same class,
+    IoU >= --iou), and the mean confidence drift of matched boxes
+  * how often the /detect category response agrees with the baseline's,
+    and which photos disagree
+  * per-image latency (batch of one) and speedup over the baseline
+
+    python -m activity.compare_backends --images photos/ \\
+        --candidate onnx:yolov8n-int8.onnx \\
+        --candidate openvino:yolov8n_openvino_model/yolov8n-int8.xml
+
+Pass --min-agreement to exit non-zero when a candidate's category
+agreement falls below it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from activity.backends import DEFAULT_MODELS, THREADS, image_files, load_backend, load_frames
+from activity.categories import categorize
+from activity.stream import iou
+
+
+def parse_spec(spec):
+    """"onnx:model.onnx" -> ("onnx", "model.onnx"); a bare name uses the default path"""
+    name, _, path = spec.partition(":")
+    return name, path or DEFAULT_MODELS.get(name, "")
+
+
+def run_backend(predict, frames, runs):
+    """Detections per frame, and the best of `runs` timings per frame in ms"""
+    predict(frames[:1])  # Warm-up: lazy allocations, graph compilation
+    detections, latencies = [], []
+    for frame in frames:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = predict([frame])[0]
+            timings.append(1000 * (time.perf_counter() - start))
+        detections.append(result)
+        latencies.append(min(timings))
+    return detections, latencies
+
+
+def match(baseline, candidate, min_iou):
+    """Greedy same-class IoU matching; returns (matched pairs, unmatched counts)"""
+    unmatched = list(candidate)
+    pairs = []
+    for b in sorted(baseline, key=lambda d: -d["confidence"]):
+        best = max(
+            (c for c in unmatched if c["name"] == b["name"]),
+            key=lambda c: iou(b["box"], c["box"]),
+            default=None,
+        )
+        if best is not None and iou(b["box"], best["box"]) >= min_iou:
+            unmatched.remove(best)
+            pairs.append((b, best))
+    return pairs
+
+
+def category_key(detections):
+    return {k: sorted(d["item"] for d in v["details"]) for k, v in categorize(detections).items()}
+
+
+def compare(names, baseline, candidate, min_iou):
+    base_dets, base_ms = baseline
+    cand_dets, cand_ms = candidate
+    matched = base_total = cand_total = 0
+    drift, overlaps, disagreements = [], [], []
+    for name, b, c in zip(names, base_dets, cand_dets):
+        pairs = match(b, c, min_iou)
+        matched += len(pairs)
+        base_total += len(b)
+        cand_total += len(c)
+        drift.extend(abs(x["confidence"] - y["confidence"]) for x, y in pairs)
+        overlaps.extend(iou(x["box"], y["box"]) for x, y in pairs)
+        if category_key(b) != category_key(c):
+            disagreements.append(name)
+    return {
+        "recall": round(matched / base_total, 4) if base_total else 1.0,
+        "precision": round(matched / cand_total, 4) if cand_total else 1.0,
+        "baseline_detections": base_total,
+        "candidate_detections": cand_total,
+        "mean_confidence_drift": round(float(np.mean(drift)), 4) if drift else 0.0,
+        "mean_matched_iou": round(float(np.mean(overlaps)), 4) if overlaps else 1.0,
+        "category_agreement": round(1 - len(disagreements) / len(names), 4),
+        "category_disagreements": disagreements,
+        "latency_ms": latency_summary(cand_ms),
+        "speedup": round(float(np.mean(base_ms) / np.mean(cand_ms)), 2),
+    }
+
+
+def latency_summary(latencies):
+    return {
+        "mean": round(float(np.mean(latencies)), 2),
+        "p50": round(float(np.percentile(latencies, 50)), 2),
+        "p95": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends against the FP32 baseline")
+    parser.add_argument("--images", required=True, help="directory of local test photos")
+    parser.add_argument("--baseline", default="torch", help="backend:path of the reference (default: %(default)s)")
+    parser.add_argument("--candidate", action="append", required=True, help="backend:path to check; repeatable")
+    parser.add_argument("--limit", type=int, help="only use the first N photos")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per photo, best kept (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=THREADS, help="intra-op threads for every backend")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a matching box (default: %(default)s)")
+    parser.add_argument("--min-agreement", type=float, help="fail if category agreement is below this")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    names = [os.path.basename(p) for p in image_files(args.images)[:args.limit]]
+    frames = load_frames(args.images, args.limit)
+
+    name, path = parse_spec(args.baseline)
+    baseline = run_backend(load_backend(name, path, args.threads), frames, args.runs)
+    report = {
+        "images": len(frames),
+        "baseline": {"backend": args.baseline, "latency_ms": latency_summary(baseline[1])},
+        "candidates": {},
+    }
+    for spec in args.candidate:
+        name, path = parse_spec(spec)
+        candidate = run_backend(load_backend(name, path, args.threads), frames, args.runs)
+        report["candidates"][spec] = compare(names, baseline, candidate, args.iou)
+
+    print(f"{len(frames)} images, baseline {args.baseline}: {report['baseline']['latency_ms']['mean']} ms/image")
+    for spec, result in report["candidates"].items():
+        print(f"{spec}: recall {result['recall']}, precision {result['precision']}, "
+              f"categories {result['category_agreement']:.1%}, "
+              f"{result['latency_ms']['mean']} ms/image ({result['speedup']}x)")
+        for image in result["category_disagreements"]:
+            print(f"  categories differ on {image}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.min_agreement is not None and any(
+        r["category_agreement"] < args.min_agreement for r in report["candidates"].values()
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
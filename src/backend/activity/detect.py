@@ -1,91 +1,81 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import cv2
-import numpy as np
-import base64
-from ultralytics import YOLO
-from werkzeug.exceptions import BadRequest
+import os
+import sys
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+try:
+    from flask_sock import Sock
+except ImportError:  # The streaming endpoint needs flask-sock
+    Sock = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from activity.ingest import INPUT_SIZE, ImageTooLarge, load_base64, load_message, load_upload, request_limit
+from activity.pipeline import DetectionPipeline
+from activity.stream import serve
+from metrics import instrument, stage
+from warmup import WarmUp, add_ready_route
 
 app = Flask(__name__)
 CORS(app)
+instrument(app)  # Route and stage latencies on /metrics
+app.config["MAX_CONTENT_LENGTH"] = request_limit()  # DETECT_MAX_UPLOAD_BYTES plus encoding overhead
 
-# Load YOLOv8 model
-model = YOLO("yolov8n.pt")  # Make sure this model file exists
+# The YOLOv8 detector: PyTorch yolov8n.pt by default, or an exported
+# ONNX / OpenVINO model (DETECT_BACKEND / DETECT_MODEL / DETECT_THREADS),
+# behind admission control, a result cache and the batcher; see
+# activity/pipeline.py. Loaded on first use, or by the warm-up, which
+# /ready waits for (WARMUP=0 to skip)
+detection = DetectionPipeline()
+detection.register_metrics()
+warmup = WarmUp()
+add_ready_route(app, warmup)
 
-# Food categories
-CATEGORIES = {
-    "Vitamin A": ["carrot", "mango", "spinach", "apple", "papaya", "sweet potato", 
-                 "red bell pepper", "cantaloupe", "butternut squash", "kale"],
-    "Vitamin B": ["banana", "egg", "milk", "avocado", "legumes", "chicken", 
-                 "fish", "nuts", "whole grains", "sunflower seeds"],
-    "Vitamin C": ["orange", "lemon", "strawberry", "kiwi", "pineapple", "papaya", 
-                 "mango", "broccoli", "brussels sprouts", "bell peppers"],
-    "Minerals": ["broccoli", "kale", "spinach", "cauliflower", "mushrooms", 
-                "peas", "lentils", "potatoes", "nuts", "seeds"],
-    "Macronutrients": ["almond", "cashew", "walnut", "peanut", "pumpkin seeds", 
-                      "chia seeds", "oats", "brown rice", "quinoa", "whole wheat bread", "tomato"]
-}
+@warmup.step("detector")
+def warm_detector():
+    detection.warm_up()
 
-def process_image(image_data):
-    """Process image from either file upload or base64"""
+def process_image(image_data, size=INPUT_SIZE):
+    """Process image from either file upload or base64 into a model-sized frame"""
     try:
         if isinstance(image_data, str):  # Base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            binary_data = base64.b64decode(image_data)
-            np_img = np.frombuffer(binary_data, np.uint8)
-        else:  # File upload
-            np_img = np.frombuffer(image_data.read(), np.uint8)
-        
-        img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-        if img is None:
-            raise ValueError("Could not decode image")
-        return img
+            return load_base64(image_data, size)
+        return load_upload(image_data, size)  # File upload
+    except ImageTooLarge as e:
+        raise RequestEntityTooLarge(str(e))
     except Exception as e:
         raise BadRequest(f"Image processing failed: {str(e)}")
 
 @app.route("/detect", methods=["POST"])
 def detect_objects():
-    try:
+    def load_frame(size):
         # Handle both file upload and base64 JSON
-        if 'image' in request.files:
-            img = process_image(request.files['image'])
-        elif request.is_json and 'image' in request.json:
-            img = process_image(request.json['image'])
-        else:
-            raise BadRequest("No image provided. Send either as file upload or base64 in JSON")
+        with stage("upload"):  # Reading and parsing the request body
+            files = request.files
+            payload = request.get_json(silent=True) if 'image' not in files else None
+        if 'image' in files:
+            return process_image(files['image'], size)
+        if isinstance(payload, dict) and 'image' in payload:
+            return process_image(payload['image'], size)
+        raise BadRequest("No image provided. Send either as file upload or base64 in JSON")
 
-        # Run YOLO detection
-        results = model(img)
-        detections = []
+    # Run YOLO detection unless a near-identical frame was just seen; errors,
+    # shedding and deadlines map to responses in DetectionPipeline.handle
+    return detection.handle(request.headers, load_frame)
 
-        # Process detections
-        for r in results:
-            for box in r.boxes:
-                class_id = int(box.cls)
-                name = r.names[class_id].lower()  # Convert to lowercase for matching
-                confidence = float(box.conf)
-                detections.append({"name": name, "confidence": confidence})
+@app.route("/detect/stats", methods=["GET"])
+def detect_stats():
+    return jsonify(detection.stats())
 
-        # Prepare response
-        response = {}
-        for category, items in CATEGORIES.items():
-            matched = [
-                {"item": d["name"], "confidence": d["confidence"]}
-                for d in detections if d["name"] in [item.lower() for item in items]
-            ]
-            response[category.lower().replace(" ", "_")] = {
-                "detected": len(matched) > 0,
-                "details": matched,
-            }
+if Sock is not None:
+    sock = Sock(app)
 
-        return jsonify(response)
+    @sock.route("/detect/stream")
+    def detect_stream(ws):
+        """Live detection over a WebSocket; see activity/stream.py for the protocol"""
+        serve(ws, detection.stream_session(), load_message)
 
-    except BadRequest as e:
-        return jsonify({"error": str(e)}), 400
-    except Exception as e:
-        app.logger.error(f"Detection error: {str(e)}")
-        return jsonify({"error": "Object detection failed", "details": str(e)}), 500
+warmup.start()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
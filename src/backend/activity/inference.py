@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from activity.admission import DeadlineExceeded, Overloaded
+from metrics import REGISTRY
+
+# Upper bounds on how many frames go into one model call and how long the
+# first frame of a batch may wait for company
+MAX_BATCH = int(os.environ.get("DETECT_MAX_BATCH", 8))
+MAX_WAIT_MS = float(os.environ.get("DETECT_MAX_WAIT_MS", 10))
+# Frames that may wait for the worker; submit raises Overloaded beyond that
+MAX_PENDING = int(os.environ.get("DETECT_MAX_PENDING", 256))
+
+model_latency = REGISTRY.histogram("detect_model_seconds", "Time in one batched model call", ("batch_size",))
+
+
+def yolo_predict(model):
+    """Adapt an ultralytics model to the scheduler: a list of images in, a
+    list of {"name", "confidence", "box"} detections per image out, with
+    boxes as [x1, y1, x2, y2] in input pixels"""
+    def predict(images, confidence=0.25):  # ultralytics' own default
+        # Run at the frames' own size, so degraded (smaller) frames are cheaper
+        results = model(images, verbose=False, imgsz=images[0].shape[0], conf=confidence)
+        return [
+            [
+                {"name": r.names[int(box.cls)], "confidence": float(box.conf), "box": box.xyxy[0].tolist()}
+                for box in r.boxes
+            ]
+            for r in results
+        ]
+    return predict
+
+
+class BatchScheduler:
+    """Owns the model on a single worker thread and feeds it batches.
+
+    Request threads `submit` decoded frames and wait on the returned future.
+    The worker takes the first queued frame, keeps collecting until it has
+    `max_batch` frames or `max_wait_ms` has passed, runs one batched call
+    per frame size and confidence cutoff, and hands each caller its own
+    result. Frames whose deadline has passed by then are dropped unrun. If a
+    batched call fails, or returns a result count that doesn't match its
+    frames, the frames are retried one by one, so a bad frame only fails its
+    own request.
+    """
+
+    def __init__(self, predict, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, max_pending=MAX_PENDING):
+        self.predict = predict
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.queue = queue.Queue(max(self.max_batch, max_pending))
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.images = 0
+        self.inference_seconds = 0.0
+        self.max_queue_depth = 0
+        self.expired = 0
+        self.worker = threading.Thread(target=self._run, name="detect-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, image, deadline=None, confidence=None):
+        """Queue a frame; it is dropped with DeadlineExceeded if still queued at
+        `deadline` (time.monotonic()). `confidence` overrides the backend's cutoff.
+        Raises Overloaded when `max_pending` frames are already waiting"""
+        return self._enqueue(image, deadline, confidence, record=True)
+
+    def detect(self, image, timeout=None, deadline=None, confidence=None):
+        """Run detection on one image through the batcher and wait for it, at
+        most `timeout` seconds and never past `deadline`"""
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        future = self.submit(image, deadline, confidence)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()  # Still queued: the worker skips it
+            raise DeadlineExceeded("Request deadline passed waiting for the detector")
+
+    def backlog(self):
+        """Frames waiting for the worker, in batches: how far behind the model is"""
+        return self.queue.qsize() / self.max_batch
+
+    def warm_up(self, size):
+        """Run blank frames through the model: one full batch, then a single frame,
+        so the first real requests don't pay for lazy allocation and kernel setup"""
+        frame = np.full((size, size, 3), 114, np.uint8)
+        # Through the worker thread, which owns the model, but left out of the stats
+        for future in [self._enqueue(frame, record=False) for _ in range(self.max_batch)]:
+            future.result()
+        self._enqueue(frame, record=False).result()
+
+    def stats(self):
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "expired": self.expired,
+                "batches": batches,
+                "images": self.images,
+                "mean_batch_size": round(self.images / batches, 2) if batches else 0.0,
+                "batch_sizes": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                "mean_inference_ms": round(1000 * self.inference_seconds / batches, 2) if batches else 0.0,
+                "max_batch": self.max_batch,
+                "max_pending": self.queue.maxsize,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    def _enqueue(self, image, deadline=None, confidence=None, record=True):
+        future = Future()
+        try:
+            self.queue.put_nowait((image, future, deadline, confidence, record))
+        except queue.Full:
+            raise Overloaded("Detector queue is full")
+        if record:
+            depth = self.queue.qsize()
+            with self.lock:
+                if depth > self.max_queue_depth:
+                    self.max_queue_depth = depth
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # Whatever is already queued joins for free
+                batch.append(self.queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            now = time.monotonic()
+            groups = {}
+            for image, future, deadline, confidence, record in items:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and now > deadline:
+                    # The client has given up; don't spend the model on it
+                    future.set_exception(DeadlineExceeded("Request deadline passed in the batch queue"))
+                    with self.lock:
+                        self.expired += 1
+                    continue
+                # Frames of different sizes or cutoffs can't share a model call
+                groups.setdefault((image.shape, confidence, record), []).append((image, future))
+            for (_, confidence, record), batch in groups.items():
+                self._predict(batch, confidence, record)
+
+    def _predict(self, batch, confidence, record=True):
+        start = time.perf_counter()
+        try:
+            images = [image for image, _ in batch]
+            results = self.predict(images) if confidence is None else self.predict(images, confidence)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Detector returned {len(results)} results for {len(batch)} frames")
+        except Exception as e:
+            if len(batch) > 1:
+                # Find the frame that broke the batch instead of failing all of them
+                for item in batch:
+                    self._predict([item], confidence, record)
+                return
+            batch[0][1].set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        if not record:  # Warm-up frames aren't traffic
+            return
+        model_latency.observe(elapsed, str(len(batch)))
+        with self.lock:
+            self.batch_sizes[len(batch)] += 1
+            self.images += len(batch)
+            self.inference_seconds += elapsed
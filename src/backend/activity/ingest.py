@@ -0,0 +1,148 @@
+"""Turn uploaded photos into model-sized frames with as little work as possible.
+
+Phone photos are 12+ MP but the detector only looks at INPUT_SIZE pixels,
+so the encoded bytes are decoded in place (no extra copies of the upload),
+JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from the DCT when that
+still covers the model input, and the result is letterboxed to the model's
+square input.
+"""
+import binascii
+import os
+
+import cv2
+import numpy as np
+
+from metrics import stage
+
+# Model input side, largest accepted upload and largest accepted image
+INPUT_SIZE = int(os.environ.get("DETECT_INPUT_SIZE", 640))
+MAX_UPLOAD_BYTES = int(os.environ.get("DETECT_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+MAX_PIXELS = int(os.environ.get("DETECT_MAX_PIXELS", 50_000_000))
+
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def request_limit():
+    """Body size to allow for one upload, leaving room for base64/multipart overhead"""
+    return MAX_UPLOAD_BYTES * 4 // 3 + 64 * 1024
+
+
+def load_upload(file, size=INPUT_SIZE):
+    """Decode an uploaded file (werkzeug FileStorage or any binary stream)"""
+    stream = getattr(file, "stream", file)
+    if hasattr(stream, "getbuffer"):
+        # Small uploads are kept in a BytesIO; decode straight from its buffer
+        view = stream.getbuffer()
+    else:
+        stream.seek(0, os.SEEK_END)
+        length = stream.tell()
+        stream.seek(0)
+        if length > MAX_UPLOAD_BYTES:
+            raise ImageTooLarge(f"Upload is {length} bytes, limit is {MAX_UPLOAD_BYTES}")
+        view = memoryview(bytearray(length))
+        read = 0
+        while read < length:
+            n = stream.readinto(view[read:])
+            if not n:
+                break
+            read += n
+        view = view[:read]
+    try:
+        if len(view) > MAX_UPLOAD_BYTES:
+            raise ImageTooLarge(f"Upload is {len(view)} bytes, limit is {MAX_UPLOAD_BYTES}")
+        return decode_image(np.frombuffer(view, np.uint8), size)
+    finally:
+        # A live export would stop werkzeug from closing the BytesIO
+        try:
+            view.release()
+        except BufferError:
+            pass
+
+
+def load_base64(data, size=INPUT_SIZE):
+    """Decode a base64 string, with or without a data: URL prefix"""
+    start = data.find(",", 0, 100) + 1
+    if (len(data) - start) * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Image is over the {MAX_UPLOAD_BYTES} byte limit")
+    with stage("base64_decode"):
+        binary = binascii.a2b_base64(data[start:] if start else data)
+    return decode_image(np.frombuffer(binary, np.uint8), size)
+
+
+def load_message(message, size=INPUT_SIZE):
+    """Decode a stream message: raw image bytes or base64 text"""
+    if isinstance(message, str):
+        return load_base64(message, size)
+    if len(message) > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Frame is {len(message)} bytes, limit is {MAX_UPLOAD_BYTES}")
+    return decode_image(np.frombuffer(message, np.uint8), size)
+
+
+def decode_image(buf, size=INPUT_SIZE):
+    """Decode encoded image bytes to a size x size letterboxed BGR frame"""
+    dims = image_size(buf)
+    if dims and dims[0] * dims[1] > MAX_PIXELS:
+        raise ImageTooLarge(f"Image is {dims[0]}x{dims[1]}, limit is {MAX_PIXELS} pixels")
+
+    flag = cv2.IMREAD_COLOR
+    if dims:
+        for factor, reduced in REDUCED_FLAGS:
+            if max(dims) // factor >= size:
+                flag = reduced
+                break
+    with stage("imdecode"):
+        img = cv2.imdecode(buf, flag)
+    if img is None:
+        raise ValueError("Could not decode image")
+    if not dims and img.shape[0] * img.shape[1] > MAX_PIXELS:
+        raise ImageTooLarge(f"Image is {img.shape[1]}x{img.shape[0]}, limit is {MAX_PIXELS} pixels")
+    with stage("letterbox"):
+        return letterbox(img, size)
+
+
+def letterbox(img, size=INPUT_SIZE, color=114):
+    """Scale the longer side to `size` and pad to a square, YOLO style"""
+    h, w = img.shape[:2]
+    if max(h, w) != size:
+        scale = size / max(h, w)
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=interpolation)
+        h, w = img.shape[:2]
+    top, left = (size - h) // 2, (size - w) // 2
+    if top or left or h != w:
+        img = cv2.copyMakeBorder(
+            img, top, size - h - top, left, size - w - left, cv2.BORDER_CONSTANT, value=(color, color, color)
+        )
+    return img
+
+
+def image_size(buf):
+    """(width, height) from a JPEG or PNG header, or None for other formats"""
+    def u16(pos):
+        return int.from_bytes(buf[pos:pos + 2].tobytes(), "big")
+
+    if buf[:8].tobytes() == b"\x89PNG\r\n\x1a\n" and len(buf) >= 24:
+        return (int.from_bytes(buf[16:20].tobytes(), "big"), int.from_bytes(buf[20:24].tobytes(), "big"))
+    if buf[:2].tobytes() != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 9 < len(buf):
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        # SOF0..SOF15 carry the frame size; C4, C8 and CC are other tables
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return (u16(pos + 7), u16(pos + 5))
+        pos += 2 + u16(pos + 2)
+    return None
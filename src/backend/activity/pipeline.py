@@ -0,0 +1,121 @@
+"""The detection path shared by activity/app.py and activity/detect.py.
+
+Both services answer /detect the same way: admission control (see
+activity/admission.py), then the perceptual-hash result cache, then the
+batch scheduler and categorization. `DetectionPipeline` holds those pieces
+so the two services can't drift apart; each only supplies how it reads
+the upload.
+"""
+import logging
+
+from flask import jsonify
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+from activity.admission import (
+    DEGRADED_SIZE, RETRY_AFTER, AdmissionController, DeadlineExceeded, Overloaded, request_deadline,
+)
+from activity.backends import load_backend
+from activity.categories import categorize
+from activity.inference import BatchScheduler
+from activity.ingest import INPUT_SIZE, ImageTooLarge
+from activity.result_cache import DetectionCache, dhash
+from activity.stream import StreamSession
+from metrics import REGISTRY, stage
+from warmup import Lazy
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionPipeline:
+    def __init__(self, admission=None, cache=None, load=load_backend):
+        # Bounds concurrent and queued work and sheds the rest
+        # (DETECT_MAX_IN_FLIGHT / DETECT_MAX_QUEUE / DETECT_TIMEOUT_MS / DETECT_DEGRADE)
+        self.admission = admission or AdmissionController()
+        # Repeat captures of the same plate reuse the last response
+        # (DETECT_CACHE_SIZE / DETECT_CACHE_TTL / DETECT_CACHE_DISTANCE)
+        self.cache = cache or DetectionCache()
+        # One worker thread owns the model and batches concurrent requests
+        # (DETECT_MAX_BATCH / DETECT_MAX_WAIT_MS); loaded on first use
+        self.scheduler = Lazy(lambda: self._build(load))
+
+    def _build(self, load):
+        predict = load()
+        size = getattr(predict, "input_size", None)
+        if size:
+            self.admission.disable("size", f"the model only takes {size}x{size} input")
+        return BatchScheduler(predict)
+
+    def warm_up(self):
+        """Load the model and run it at every frame size requests may use"""
+        scheduler = self.scheduler.get()
+        scheduler.warm_up(INPUT_SIZE)
+        if "size" in self.admission.degrade:
+            scheduler.warm_up(DEGRADED_SIZE)
+
+    def register_metrics(self, registry=REGISTRY):
+        scheduler, cache, admission = self.scheduler, self.cache, self.admission
+        registry.function("detect_queue_depth", "Frames waiting for the detector",
+                          lambda: scheduler.value.queue.qsize() if scheduler.loaded else 0)
+        registry.function("detect_cache_hits_total", "Detections answered from the cache",
+                          lambda: cache.hits, kind="counter")
+        registry.function("detect_cache_misses_total", "Detections that ran the model",
+                          lambda: cache.misses, kind="counter")
+        registry.function("detect_admission_waiting", "Requests waiting for a detection slot",
+                          lambda: admission.waiting)
+        registry.function("detect_shed_total", "Requests turned away, by reason",
+                          lambda: {"overloaded": admission.rejected, "deadline": admission.expired},
+                          ("reason",), kind="counter")
+        registry.function("detect_degraded_total", "Requests run in a degraded mode",
+                          lambda: admission.degraded, kind="counter")
+
+    def detect(self, img, ticket):
+        """The categorized response for a frame, and whether the model ran degraded for it"""
+        with stage("dhash"):
+            key = dhash(img)
+        response = self.cache.get(key)
+        if response is not None:
+            return response, False
+        ticket.check()  # Don't queue for the model past the client's deadline
+        with stage("inference"):  # Queueing for the batcher plus the model call
+            detections = self.scheduler.get().detect(img, deadline=ticket.deadline, confidence=ticket.confidence)
+        with stage("categorize"):
+            response = categorize(detections)
+        if not ticket.degraded:  # A degraded result must not stand in for a full one
+            self.cache.put(key, response)
+        return response, bool(ticket.degraded)
+
+    def handle(self, headers, load_frame):
+        """Answer one /detect request.
+
+        `load_frame(size)` reads the upload into a size x size frame; it is
+        only called once a slot is held, so a shed request never buffers its
+        image. An image that is too large is a 413, an unreadable one (a
+        ValueError or BadRequest) a 400, and any other failure a 500.
+        """
+        try:
+            with self.admission.admit(request_deadline(headers)) as ticket:
+                img = load_frame(ticket.size)
+                response, degraded = self.detect(img, ticket)
+                with stage("json_encode"):
+                    body = jsonify(response)
+        except Overloaded as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": str(RETRY_AFTER)}
+        except DeadlineExceeded as e:
+            self.admission.count_expired()
+            return jsonify({"error": str(e)}), 504
+        except (ImageTooLarge, RequestEntityTooLarge) as e:
+            return jsonify({"error": str(e)}), 413
+        except (ValueError, BadRequest) as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.exception("Detection failed")
+            return jsonify({"error": "Object detection failed", "details": str(e)}), 500
+        if degraded:
+            body.headers["X-Degraded"] = ",".join(ticket.degraded)
+        return body
+
+    def stats(self):
+        return dict(self.scheduler.get().stats(), cache=self.cache.stats(), admission=self.admission.stats())
+
+    def stream_session(self):
+        return StreamSession(self.scheduler.get(), categorize, admission=self.admission)
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Entries kept, seconds an entry stays valid, and how many of the 64 hash
+# bits two captures may differ in and still count as the same plate.
+# DETECT_CACHE_SIZE=0 turns the cache off.
+CACHE_SIZE = int(os.environ.get("DETECT_CACHE_SIZE", 256))
+CACHE_TTL = float(os.environ.get("DETECT_CACHE_TTL", 30))
+MAX_DISTANCE = int(os.environ.get("DETECT_CACHE_DISTANCE", 6))
+
+
+def dhash(img):
+    """64-bit difference hash: brightness gradients of a 9x8 thumbnail"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), "big")
+
+
+class DetectionCache:
+    """Detection responses keyed by perceptual hash, matched by Hamming distance.
+
+    Near-duplicate captures of the same scene hash to nearby values, so a
+    lookup returns the closest live entry within `max_distance` bits. A
+    linear scan over at most `max_entries` ints is far cheaper than an
+    inference. Entries expire `ttl` seconds after they were stored; beyond
+    `max_entries`, the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, max_distance=MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            # Entries are in recency order, not storage order, so any of them may be stale
+            best, best_distance, stale = None, self.max_distance + 1, []
+            for candidate, (stored, _) in self.entries.items():
+                if now - stored > self.ttl:
+                    stale.append(candidate)
+                    continue
+                distance = (candidate ^ key).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+            for candidate in stale:
+                del self.entries[candidate]
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best)
+            return self.entries[best][1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic(), value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)  # Least recently stored or hit
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "max_distance": self.max_distance,
+            }
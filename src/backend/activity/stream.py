@@ -0,0 +1,201 @@
+"""Continuous detection over a live camera stream.
+
+The client keeps one WebSocket open and sends small JPEG frames (binary
+messages, or base64 text). Each stream has at most one inference in flight
+at a time, and waits at least STREAM_MIN_INTERVAL_MS between inferences,
+stretched further while the shared batch queue is backed up. Frames that
+arrive in between are skipped by the detector, and decoded only at
+MOTION_SIZE (not at all while nothing is tracked): the tracked boxes follow
+the camera's global motion, estimated by phase correlation on that small
+grayscale copy. Tracks that go unseen by STREAM_MAX_MISSES inferences are
+dropped.
+
+The server only sends a message, the same category shape as /detect, when
+the set of tracked items changes.
+"""
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from activity.admission import Overloaded
+from activity.ingest import INPUT_SIZE
+
+MIN_INTERVAL_MS = float(os.environ.get("STREAM_MIN_INTERVAL_MS", 200))
+MAX_MISSES = int(os.environ.get("STREAM_MAX_MISSES", 2))
+MATCH_IOU = 0.3
+MOTION_SIZE = 160
+POLL_SECONDS = 0.05
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class StreamSession:
+    """Detection state for one client's stream.
+
+    `scheduler` is the shared BatchScheduler; `categorize` turns a list of
+    {"name", "confidence"} detections into the /detect response body.
+    `size` is the side of the frames sent to the detector, and of the
+    coordinates tracks are kept in. With an `admission` controller, each
+    inference needs a free slot, held until its result is in, and runs
+    degraded when the ticket says so; without a slot the frame is skipped.
+    """
+
+    def __init__(self, scheduler, categorize, min_interval_ms=MIN_INTERVAL_MS, max_misses=MAX_MISSES,
+                 size=INPUT_SIZE, admission=None):
+        self.scheduler = scheduler
+        self.categorize = categorize
+        self.size = size
+        self.admission = admission
+        self.pending_size = size
+        self.min_interval = min_interval_ms / 1000
+        self.max_misses = max_misses
+        self.tracks = []
+        self.pending = None
+        self.pending_shift = np.zeros(2)
+        self.prev_gray = None
+        self.last_inference = 0.0
+        self.last_payload = None
+        self.frames = 0
+        self.inferences = 0
+
+    def push(self, message, decode):
+        """Feed one encoded frame; returns the new payload if it changed.
+
+        `decode(message, size)` turns it into a size x size frame. A frame is
+        decoded once: at full size if it goes to the detector (the motion
+        estimate gets a scaled-down copy), at MOTION_SIZE if there's only
+        motion to follow, and not at all while nothing needs it.
+        """
+        self.frames += 1
+        self._collect()
+        frame = None
+        if self.pending is None and self._due():
+            try:
+                self.pending, self.pending_size, frame = self._submit(message, decode)
+            except Overloaded:
+                pass  # Tracks keep following the camera until there's room
+            else:
+                self.last_inference = time.monotonic()
+                self.inferences += 1
+        if frame is not None:
+            self._follow_motion(cv2.resize(frame, (MOTION_SIZE, MOTION_SIZE), interpolation=cv2.INTER_AREA))
+            self.pending_shift = np.zeros(2)  # The detector sees this frame as it is
+        elif self.tracks or self.pending is not None:
+            self._follow_motion(decode(message, MOTION_SIZE))
+        else:
+            self.prev_gray = None  # Nothing to move; the next frame starts afresh
+        return self._changed()
+
+    def poll(self):
+        """Pick up a finished inference while the client is quiet"""
+        self._collect()
+        return self._changed()
+
+    def _submit(self, message, decode):
+        """Send the frame to the detector; returns its future, size and the decoded frame"""
+        if self.admission is None:
+            frame = decode(message, self.size)
+            return self.scheduler.submit(frame), self.size, frame
+        ticket = self.admission.acquire(wait=False)
+        try:
+            frame = decode(message, ticket.size)
+            future = self.scheduler.submit(frame, confidence=ticket.confidence)
+        except BaseException:
+            self.admission.release()
+            raise
+        future.add_done_callback(lambda _: self.admission.release())
+        return future, ticket.size, frame
+
+    def _due(self):
+        # Back off while the shared queue holds more than a batch's worth
+        return time.monotonic() - self.last_inference >= self.min_interval * (1 + self.scheduler.backlog())
+
+    def _follow_motion(self, small):
+        # `small` is the frame letterboxed to MOTION_SIZE; boxes are in detector frame pixels
+        gray = np.float32(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        if self.prev_gray is not None and self.prev_gray.shape == gray.shape:
+            (dx, dy), response = cv2.phaseCorrelate(self.prev_gray, gray)
+            if response > 0.1:
+                shift = np.array([dx, dy]) * self.size / MOTION_SIZE
+                self.pending_shift += shift
+                for track in self.tracks:
+                    track["box"] = [
+                        track["box"][0] + shift[0], track["box"][1] + shift[1],
+                        track["box"][2] + shift[0], track["box"][3] + shift[1],
+                    ]
+        self.prev_gray = gray
+
+    def _collect(self):
+        if self.pending is None or not self.pending.done():
+            return
+        future, self.pending = self.pending, None
+        if future.exception() is not None:
+            return
+        dx, dy = self.pending_shift
+        scale = self.size / self.pending_size  # A degraded inference ran on a smaller frame
+        detections = [
+            dict(d, box=[d["box"][0] * scale + dx, d["box"][1] * scale + dy,
+                         d["box"][2] * scale + dx, d["box"][3] * scale + dy])
+            for d in future.result()
+        ]
+
+        # Greedy IoU matching against live tracks of the same class
+        unmatched = list(self.tracks)
+        tracks = []
+        for d in sorted(detections, key=lambda d: -d["confidence"]):
+            best = max(
+                (t for t in unmatched if t["name"] == d["name"]),
+                key=lambda t: iou(t["box"], d["box"]),
+                default=None,
+            )
+            if best is not None and iou(best["box"], d["box"]) >= MATCH_IOU:
+                unmatched.remove(best)
+            tracks.append({"name": d["name"], "confidence": d["confidence"], "box": d["box"], "misses": 0})
+        for t in unmatched:
+            if t["misses"] < self.max_misses:
+                tracks.append(dict(t, misses=t["misses"] + 1))
+        self.tracks = tracks
+
+    def _changed(self):
+        payload = self.categorize(
+            [{"name": t["name"], "confidence": round(t["confidence"], 2)} for t in self.tracks]
+        )
+        # Confidence jitter alone isn't worth a message
+        key = {k: sorted(d["item"] for d in v["details"]) for k, v in payload.items()}
+        if key == self.last_payload:
+            return None
+        self.last_payload = key
+        return payload
+
+
+def serve(ws, session, decode):
+    """Run one WebSocket stream until the client disconnects.
+
+    `decode(message, size)` turns a message (bytes, or base64 text) into a
+    size x size frame.
+    """
+    while True:
+        message = ws.receive(timeout=POLL_SECONDS)
+        if message is None:
+            update = session.poll()
+        else:
+            try:
+                update = session.push(message, decode)
+            except ValueError as e:
+                ws.send(json.dumps({"error": str(e)}))
+                continue
+        if update is not None:
+            ws.send(json.dumps({
+                "frame": session.frames,
+                "inferences": session.inferences,
+                "categories": update,
+            }))
@@ -1,73 +1,96 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pandas as pd
+import io
 import os
-import PyPDF2
+import threading
+from diet_plan.plans import daily_schedule, diet_paths
+from disease_overview.fulltext import FullTextIndex
+from disease_overview.pdf_cache import PdfTextCache, file_version, page_span, resolve_pdf
+from disease_overview.symptom_matcher import MAX_BATCH, SymptomMatcher
+from http_cache import CachedResponse, ResponseCache
+from medicine_search.catalog import MAX_BULK, SEARCH_MODES, CatalogStore, page_args
+from metrics import instrument, stage
+from warmup import Lazy, WarmUp, add_ready_route
 
 app = Flask(__name__)
 # CORS(app)
 CORS(app, resources={r"/*": {"origins": "*"}})  # Allows React frontend to communicate with Flask backend
+instrument(app)  # Route and stage latencies on /metrics
 
-# Medicine Search
-file_path = r"C:\\VISHNU_VIT\\SEM\\SEM 8\\Capstone\\wellifo\\src\\backend\\medicine_search\\updated_indian_medicine_data.csv"
-df = pd.read_csv(file_path)
-df.fillna("Not Available", inplace=True)
+# Subsystems load on first use; the warm-up loads them ahead of traffic and
+# /ready reports when it's done (WARMUP=0 to skip). Steps are tagged with
+# serve.py's route groups, so each process only warms what it serves
+warmup = WarmUp()
+add_ready_route(app, warmup)
+
+# Medicine Search (compile the snapshot with `python -m medicine_search.snapshot`)
+catalog = Lazy(CatalogStore)
+medicine_responses = ResponseCache()  # Per snapshot build and name
+
+@warmup.step("medicine", group="search")
+def warm_medicine():
+    # Page in the snapshot's name list, details and n-gram postings
+    index = catalog.get().current()
+    index.search("pa", "prefix")
+    index.search("paracetmol", "fuzzy")
 
 @app.route("/search", methods=["GET"])
 def search_medicine():
     query = request.args.get("query", "").strip().lower()
     if not query:
         return jsonify([])
-    filtered_df = df[df["name"].str.lower().str.startswith(query)]
-    suggestions = filtered_df[["name"]].to_dict(orient="records")
-    return jsonify(suggestions)
+    page = page_args(request.args)
+    if page is None:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    mode = request.args.get("mode", "auto")
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    with stage("search"):
+        results = catalog.get().current().search(query, mode, *page)
+    with stage("json_encode"):
+        return jsonify(results)
 
 @app.route("/medicine/<name>", methods=["GET"])
 def get_medicine_details(name):
-    medicine = df[df["name"].str.lower() == name.lower()]
-    if medicine.empty:
+    # Read the build before the index: a swap in between only files new
+    # details under the old build's key, which is never asked for again
+    store = catalog.get()
+    build = store.build
+    index = store.current()
+
+    def cached():
+        details = index.get(name)
+        return None if details is None else CachedResponse(details)
+
+    entry = medicine_responses.get((build, name.strip().lower()), cached)
+    if entry is None:
         return jsonify({"error": "Medicine not found"}), 404
-    details = medicine.iloc[0].to_dict()
-    return jsonify(details)
+    return entry.response()
+
+@app.route("/medicines", methods=["POST"])
+def get_medicines_bulk():
+    names = (request.json or {}).get("names")
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        return jsonify({"error": "names must be a list of strings"}), 400
+    if len(names) > MAX_BULK:
+        return jsonify({"error": f"At most {MAX_BULK} names per request"}), 400
+    return Response(catalog.get().current().bulk(names), mimetype="application/json")
 
 def calculate_bmi(weight, height):
     return round(weight / (height / 100) ** 2, 2)
 
 # Diet Plan
-diet_paths = {
-    'underweight': {
-        'veg': 'https://drive.google.com/file/d/1ZbdzjGxbvtbtwbDTgrC3GOVQ7oY0xAFP/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/1_ybJD9SPdpsSurPh_43qUSjRRm_UdmYO/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1tYr_QYXg_JgF2HHWpzMpAKEJdABs9Mhi/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/10XiahH3OKhfwjF0QiFGaZzKVU_rbuaHM/view?usp=drive_link'
-    },
-    'normal': {
-        'veg': 'https://drive.google.com/file/d/1XHuVFABwZSPae8-FxTWvJsFFhZ3VF2HI/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/1vCvvkLqjsa-pLFwKw1SOLts3vLGW-DHe/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1QYqAjBZC_ytnGRm5NicrjuEyzenV-cP5/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/1NlBUkGB08qz-Q6iTVA9B0UjnZFudqhY5/view?usp=drive_link'
-    },
-    'overweight': {
-        'veg': 'https://drive.google.com/file/d/1ZT9PypTF-D3PbAslQWk97vHxUKF3kWaC/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/142lnQC_M2tkK5r560ic69HMMJ-c7hfrV/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1Tn9KM7XuAmUGgHMamqpMFMbmHNAEyeFc/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/1JvvVXospzj3E4SkPLX-5EoOSigcGp1Gl/view?usp=drive_link'
-    }
-}
+# Plan documents and schedule, served with an ETag so clients can cache them
+diet_plans_response = CachedResponse.json({"diet_paths": diet_paths, "schedule": daily_schedule})
 
-daily_schedule = [
-    "06:30 AM - Wake Up",
-    "07:00 AM - Morning Walk",
-    "07:30 AM - Exercise",
-    "08:00 AM - Breakfast",
-    "10:30 AM - Mid-Morning Snack",
-    "01:00 PM - Lunch",
-    "04:00 PM - Evening Snack",
-    "08:00 PM - Dinner",
-    "Hydration Reminder - Every 30 Minutes",
-    "05:00 PM - Hobby Time",
-    "10:00 PM - Sleep Time"
-]
+@warmup.step("diet", group="bulk")
+def warm_diet():
+    # Imports pandas and runs one roster row through the vectorized planner
+    from diet_plan.bulk import stream_plans
+
+    roster = b"name,gender,height,weight,preference,allergies\nA,Female,165,58,veg,\n"
+    for _ in stream_plans(io.BytesIO(roster), "csv"):
+        pass
 
 @app.route('/generate-plan', methods=['POST'])
 def generate_plan():
@@ -96,6 +119,31 @@ def generate_plan():
         "schedule": daily_schedule
     })
 
+@app.route('/generate-plan/bulk', methods=['POST'])
+def generate_plan_bulk():
+    """Plans for a CSV / NDJSON roster (raw body or a "roster" file), streamed as NDJSON"""
+    from diet_plan.bulk import ROSTER_FORMATS, roster_format, stream_plans  # Loads pandas
+
+    if request.args.get('format', 'csv').lower() not in ROSTER_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(ROSTER_FORMATS)}"}), 400
+
+    @stream_with_context
+    def plans():
+        # Read the upload in here: uploaded files are closed once the view returns
+        upload = request.files.get('roster')
+        if upload:
+            fmt = roster_format(upload.mimetype, upload.filename, request.args.get('format'))
+            yield from stream_plans(upload.stream, fmt)
+        else:
+            yield from stream_plans(request.stream, roster_format(request.content_type, requested=request.args.get('format')))
+
+    return Response(plans(), mimetype='application/x-ndjson')
+
+@app.route('/diet-plans', methods=['GET'])
+def get_diet_plans():
+    """Every plan document per category and the daily schedule, for clients to cache"""
+    return diet_plans_response.response()
+
 # Disease Overview
 disease_data = {
     "Allergies": {"symptoms": ["sneezing", "runny nose", "itchy eyes", "rash", "shortness of breath"], "pdf": r"C:/VISHNU_VIT/SEM/SEM 8/Capstone/wellifo/src/backend/disease_overview/PDF/Allergies.pdf"},
@@ -123,38 +171,90 @@ disease_data = {
 }
 
 all_symptoms = sorted(set(symptom for data in disease_data.values() for symptom in data["symptoms"]))
+symptom_matcher = SymptomMatcher(disease_data)
+
+# Extracted PDF text, persisted across restarts
+pdf_texts = PdfTextCache()
+
+def load_pdf_search():
+    """Full-text index over every PDF in the folder, refreshed incrementally"""
+    index = FullTextIndex(pdf_texts)
+    threading.Thread(target=index.refresh, daemon=True).start()
+    return index
+
+pdf_search = Lazy(load_pdf_search)
+
+@warmup.step("disease", group="pdf")
+def warm_disease():
+    pdf_texts.warm(resolve_pdf(info["pdf"]) for info in disease_data.values())
+    pdf_search.get().refresh()
+pdf_diseases = {
+    os.path.splitext(os.path.basename(resolve_pdf(info["pdf"])))[0]: d for d, info in disease_data.items()
+}
+
+# Serialized, hashed and compressed once; keyed by file version and page range
+symptoms_response = CachedResponse.json(all_symptoms)
+pdf_responses = ResponseCache()
 
 @app.route("/symptoms", methods=["GET"])
 def get_symptoms():
-    return jsonify(all_symptoms)
+    return symptoms_response.response()
 
 @app.route("/search", methods=["POST"])
 def search_disease():
     data = request.json
-    symptom_input = data.get("symptom", "").lower()
+    symptom_input = data.get("symptom", "")
+    return jsonify(symptom_matcher.search(symptom_input))
 
-    detected_diseases = [
-        d for d, info in disease_data.items() if any(s in symptom_input for s in info["symptoms"])
-    ]
+@app.route("/search/batch", methods=["POST"])
+def search_disease_batch():
+    inputs = (request.json or {}).get("symptoms")
+    if not isinstance(inputs, list) or not all(isinstance(s, str) for s in inputs):
+        return jsonify({"error": "symptoms must be a list of strings"}), 400
+    if len(inputs) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} inputs per request"}), 400
+    return jsonify({"results": [symptom_matcher.search(s) for s in inputs]})
 
-    return jsonify({"diseases": detected_diseases})
-
-@app.route("/pdf", methods=["POST"])
+@app.route("/pdf", methods=["GET", "POST"])
 def get_pdf_content():
-    data = request.json
+    # GET takes the same fields as query parameters, so clients can revalidate
+    data = request.args if request.method == "GET" else request.json
     disease = data.get("disease")
 
     if disease in disease_data:
-        pdf_path = disease_data[disease]["pdf"]
+        pdf_path = resolve_pdf(disease_data[disease]["pdf"])
         if os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
-                text = "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
-            return jsonify({"content": text})
+            with stage("pdf_parse"):  # Only a cache read once the text is extracted
+                pages = pdf_texts.pages(pdf_path)
+            span = page_span(data, len(pages))
+            if span is None:
+                return jsonify({"error": f"Invalid page range, document has {len(pages)} pages"}), 400
+            start, end = span
+
+            def build():
+                text = "\n".join(page for page in pages[start - 1:end] if page)
+                return CachedResponse.json({"content": text, "pages": len(pages), "start_page": start, "end_page": end})
+
+            return pdf_responses.get((pdf_path, file_version(pdf_path), start, end), build).response()
         return jsonify({"error": "PDF not found"}), 404
 
     return jsonify({"error": "Disease not found"}), 400
 
+@app.route("/pdf/search", methods=["GET"])
+def search_pdf_text():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"results": []})
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    results = pdf_search.get().search(query, limit)
+    for result in results:
+        result["disease"] = pdf_diseases.get(result["document"])
+    return jsonify({"results": results})
+
+warmup.start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,78 @@
+"""Compare two benchmark result files case by case.
+
+    python -m benchmarks.compare results/micro-before.json results/micro-after.json
+    python -m benchmarks.compare before.json after.json --threshold 5 --fail
+
+A case regresses when a latency percentile grows, or throughput drops, by
+more than --threshold percent; --fail then exits with status 1 so CI can
+gate on it. Cases with errors in the new run always count as regressions.
+"""
+import argparse
+import json
+import sys
+
+# metric -> True when higher is better
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_rps": True}
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    """Percent change from before to after, or None when either is missing"""
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after, threshold):
+    """Rows of (case, metric, before, after, change %, regressed)"""
+    rows = []
+    for case, new in after["results"].items():
+        old = before["results"].get(case)
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            delta = change(old.get(metric), new.get(metric))
+            if delta is None:
+                continue
+            worse = -delta if higher_is_better else delta
+            rows.append((case, metric, old[metric], new[metric], delta, worse > threshold))
+        if new.get("errors", 0) > old.get("errors", 0):
+            rows.append((case, "errors", old.get("errors", 0), new["errors"], None, True))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in %% (default: %(default)s)")
+    parser.add_argument("--fail", action="store_true", help="exit 1 if anything regressed")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before["meta"]["kind"] != after["meta"]["kind"]:
+        sys.exit(f"Cannot compare a {before['meta']['kind']} run with a {after['meta']['kind']} run")
+    for label, meta in (("before", before["meta"]), ("after", after["meta"])):
+        print(f"{label}: {meta['commit'] or 'unknown commit'} on {meta['platform']}, {meta['cpus']} CPUs")
+
+    rows = compare(before, after, args.threshold)
+    print(f"{'case':<32} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}")
+    for case, metric, old, new, delta, regressed in rows:
+        shown = f"{delta:+.1f}%" if delta is not None else ""
+        print(f"{case:<32} {metric:<15} {old:>10} {new:>10} {shown:>8}{'  REGRESSED' if regressed else ''}")
+
+    regressions = sum(regressed for *_, regressed in rows)
+    missing = sorted(set(before["results"]) - set(after["results"]))
+    if missing:
+        print(f"Not in the new run: {', '.join(missing)}")
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    if args.fail and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
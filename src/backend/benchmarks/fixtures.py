@@ -0,0 +1,188 @@
+"""Synthetic, seeded inputs for the benchmarks: nothing is downloaded.
+
+    python -m benchmarks.fixtures --rows 1000000
+
+writes, under DATA_DIR:
+
+  medicines.csv   a catalog in the schema of updated_indian_medicine_data.csv,
+                  generated in chunks so millions of rows stay cheap
+  images/         JPEG food-camera captures, from phone-size to webcam-size
+  roster.csv      a diet-plan roster for /generate-plan/bulk
+  medicines.snapshot/
+                  the compiled catalog, as medicine_search.snapshot publishes it
+
+The disease PDFs come from disease_overview/PDF as shipped.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.environ.get("BENCH_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
+SEED = 1234
+CHUNK_ROWS = 100_000
+
+# Brand names are built from syllables so prefixes and typos behave like the real catalog
+SYLLABLES = ("a", "ab", "al", "am", "an", "ar", "ce", "cal", "cef", "cip", "co", "da", "de", "do", "fa", "fen",
+             "ga", "glu", "in", "la", "lev", "lo", "ma", "met", "mo", "na", "ne", "no", "ol", "pa", "pan", "pra",
+             "ra", "ro", "sa", "sel", "ta", "tel", "to", "tri", "val", "vi", "xa", "zo", "zy")
+SUFFIXES = ("", " Plus", " Forte", " DS", " SR", " MR", " XL", " LS", " Duo", " Kid")
+STRENGTHS = ("5", "10", "20", "25", "40", "50", "100", "125", "250", "400", "500", "625", "650", "1000")
+TYPES = ("Tablet", "Capsule", "Syrup", "Injection", "Suspension", "Cream", "Drops", "Gel")
+PACKS = {
+    "Tablet": "strip of 10 tablets", "Capsule": "strip of 10 capsules", "Syrup": "bottle of 100 ml Syrup",
+    "Injection": "vial of 1 Injection", "Suspension": "bottle of 60 ml Suspension", "Cream": "tube of 15 gm Cream",
+    "Drops": "bottle of 10 ml Drops", "Gel": "tube of 20 gm Gel",
+}
+MANUFACTURERS = ("Sun Pharmaceutical Industries Ltd", "Cipla Ltd", "Lupin Ltd", "Mankind Pharma Ltd",
+                 "Alkem Laboratories Ltd", "Torrent Pharmaceuticals Ltd", "Glenmark Pharmaceuticals Ltd",
+                 "Intas Pharmaceuticals Ltd", "Zydus Cadila", "Abbott", "GSK", "Dr Reddy's Laboratories Ltd")
+COMPOSITIONS = ("Paracetamol", "Amoxycillin", "Clavulanic Acid", "Azithromycin", "Cetirizine", "Pantoprazole",
+                "Metformin", "Glimepiride", "Atorvastatin", "Telmisartan", "Amlodipine", "Ibuprofen",
+                "Montelukast", "Levocetirizine", "Domperidone", "Ondansetron", "Ofloxacin", "Ambroxol")
+
+
+def medicine_frame(rows, start_id=1, rng=None):
+    """One chunk of synthetic catalog rows"""
+    rng = rng or np.random.default_rng(SEED)
+    syllables = np.array(SYLLABLES)
+    words = syllables[rng.integers(0, len(syllables), (rows, 3))]
+    lengths = rng.integers(2, 4, rows)
+    stems = np.where(lengths == 3, np.char.add(np.char.add(words[:, 0], words[:, 1]), words[:, 2]),
+                     np.char.add(words[:, 0], words[:, 1]))
+    stems = np.char.capitalize(stems.astype(str))
+    kinds = np.array(TYPES)[rng.integers(0, len(TYPES), rows)]
+    strengths = np.array(STRENGTHS)[rng.integers(0, len(STRENGTHS), rows)]
+    names = pd.Series(stems) + " " + strengths + pd.Series(np.array(SUFFIXES)[rng.integers(0, len(SUFFIXES), rows)]) \
+        + " " + kinds
+    # A few upper-cased duplicates, as in the real catalog
+    shout = rng.random(rows) < 0.02
+    names[shout] = names[shout].str.upper()
+
+    first = np.array(COMPOSITIONS)[rng.integers(0, len(COMPOSITIONS), rows)]
+    second = np.array(COMPOSITIONS)[rng.integers(0, len(COMPOSITIONS), rows)]
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + rows),
+        "name": names,
+        "price(₹)": np.round(rng.gamma(2.0, 60.0, rows) + 5, 2),
+        "Is_discontinued": rng.random(rows) < 0.03,
+        "manufacturer_name": np.array(MANUFACTURERS)[rng.integers(0, len(MANUFACTURERS), rows)],
+        "type": np.char.lower(kinds.astype(str)),
+        "pack_size_label": pd.Series(kinds).map(PACKS),
+        "short_composition1": pd.Series(first) + " (" + strengths + "mg)",
+        "short_composition2": np.where(rng.random(rows) < 0.4, pd.Series(second) + " (" + strengths + "mg)", ""),
+    })
+
+
+def write_medicine_csv(path, rows, seed=SEED, chunk_rows=CHUNK_ROWS):
+    """Write a `rows`-row catalog one chunk at a time"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, rows, chunk_rows):
+            chunk = medicine_frame(min(chunk_rows, rows - start), start + 1, rng)
+            chunk.to_csv(f, index=False, header=(start == 0))
+    return path
+
+
+def food_image(width, height, rng):
+    """A plate-like scene: textured background with a few coloured blobs"""
+    import cv2
+
+    img = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    img = cv2.resize(cv2.GaussianBlur(img, (5, 5), 0), (width, height), interpolation=cv2.INTER_LINEAR)
+    for _ in range(rng.integers(2, 6)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(width // 20, width // 5)), int(rng.integers(height // 20, height // 5)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.ellipse(img, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+    return img
+
+
+def write_images(directory, count=8, seed=SEED):
+    """JPEG captures in a mix of sizes: 12 MP phone photos down to 640x480 webcam frames"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    sizes = ((4032, 3024), (1920, 1080), (1280, 720), (640, 480))
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        width, height = sizes[i % len(sizes)]
+        path = os.path.join(directory, f"capture_{i:02d}_{width}x{height}.jpg")
+        cv2.imwrite(path, food_image(width, height, rng), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(path)
+    return paths
+
+
+def write_roster(path, rows, seed=SEED):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "name": [f"Employee {i}" for i in range(rows)],
+        "gender": rng.choice(["Male", "Female"], rows),
+        "height": np.round(rng.normal(168, 10, rows), 1),
+        "weight": np.round(rng.normal(70, 14, rows), 1),
+        "preference": rng.choice(["veg", "non-veg", "vegan"], rows),
+        "allergies": rng.choice(["", "nuts", "lactose", "nuts;lactose"], rows),
+    }).to_csv(path, index=False)
+    return path
+
+
+def data_paths(data_dir=DATA_DIR):
+    return {
+        "csv": os.path.join(data_dir, "medicines.csv"),
+        "images": os.path.join(data_dir, "images"),
+        "roster": os.path.join(data_dir, "roster.csv"),
+        "snapshot": os.path.join(data_dir, "medicines.snapshot"),
+        "pdf_cache": os.path.join(data_dir, "pdf_cache"),
+    }
+
+
+def service_env(paths, detector="stub"):
+    """Environment pointing the services at the fixtures instead of the real data"""
+    return {
+        "MEDICINE_CSV": paths["csv"],
+        "MEDICINE_SNAPSHOT": paths["snapshot"],
+        "PDF_CACHE_DIR": paths["pdf_cache"],
+        "DETECT_BACKEND": detector,
+        # Every /detect call should reach the detector
+        "DETECT_CACHE_SIZE": "0",
+    }
+
+
+def ensure(rows=100_000, images=8, roster_rows=10_000, data_dir=DATA_DIR, force=False):
+    """Create any missing fixture (all of them with `force`); returns their paths"""
+    paths = data_paths(data_dir)
+    if force or not os.path.exists(paths["csv"]):
+        write_medicine_csv(paths["csv"], rows)
+    if force or not os.path.isdir(paths["images"]):
+        write_images(paths["images"], images)
+    if force or not os.path.exists(paths["roster"]):
+        write_roster(paths["roster"], roster_rows)
+    from medicine_search import snapshot
+    from medicine_search.catalog import read_catalog_csv
+
+    if force or not snapshot.current_build(paths["snapshot"]):
+        snapshot.publish(read_catalog_csv(paths["csv"]), paths["snapshot"])
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate offline benchmark fixtures")
+    parser.add_argument("--rows", type=int, default=100_000, help="medicine catalog rows (default: %(default)s)")
+    parser.add_argument("--images", type=int, default=8, help="fixture images (default: %(default)s)")
+    parser.add_argument("--roster-rows", type=int, default=10_000, help="diet roster rows (default: %(default)s)")
+    parser.add_argument("--out", default=DATA_DIR, help="output directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = ensure(args.rows, args.images, args.roster_rows, args.out, force=True)
+    print(f"Wrote fixtures to {args.out} in {time.perf_counter() - start:.1f}s: "
+          f"{args.rows} medicines, {args.images} images, {args.roster_rows} roster rows")
+    return paths
+
+
+if __name__ == "__main__":
+    main()
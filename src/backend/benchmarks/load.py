@@ -0,0 +1,199 @@
+"""Concurrent load generator for a running service.
+
+    python -m benchmarks.load --start app --concurrency 16 --duration 30 --out results/load.json
+    python -m benchmarks.load --scenario detect --start detect
+    python -m benchmarks.load --url http://staging:5000 --duration 60
+
+--start launches the service itself (app: Flask dev server, serve: the ASGI
+mode, detect: the activity service on the stub detector), pointed at the
+benchmark fixtures, and stops it afterwards. Each client thread keeps one
+keep-alive connection and sends requests back to back, picking endpoints
+by the scenario's weights. Latency percentiles and throughput are reported
+per endpoint and overall, after a warm-up period that isn't counted.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+from benchmarks import fixtures, report
+from benchmarks.micro import SYMPTOM_TEXT, sample_names, typo
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# app.py and activity/detect.py always listen on 5000; serve.py takes SERVE_PORT
+SERVICES = {
+    "app": [sys.executable, "app.py"],
+    "serve": [sys.executable, "serve.py"],
+    "detect": [sys.executable, os.path.join("activity", "detect.py")],
+}
+
+
+def backend_scenario(paths):
+    """(name, weight, request factory) for the combined backend"""
+    names = sample_names(paths["csv"])
+
+    def quoted():
+        return urllib.parse.quote(random.choice(names))
+
+    return [
+        ("medicine.search.prefix", 30, lambda: ("GET", f"/search?query={urllib.parse.quote(random.choice(names)[:4].lower())}", None, {})),
+        ("medicine.search.fuzzy", 5, lambda: ("GET", f"/search?query={urllib.parse.quote(typo(random.choice(names)))}&mode=fuzzy", None, {})),
+        ("medicine.details", 25, lambda: ("GET", f"/medicine/{quoted()}", None, {})),
+        ("disease.symptoms", 5, lambda: ("GET", "/symptoms", None, {})),
+        ("disease.search", 15, lambda: ("POST", "/search", *json_body({"symptom": SYMPTOM_TEXT}))),
+        ("disease.pdf", 10, lambda: ("POST", "/pdf", *json_body({"disease": "Asthma"}))),
+        ("diet.generate", 10, lambda: ("POST", "/generate-plan", *json_body({
+            "name": "A", "gender": "Female", "height": random.randint(150, 190),
+            "weight": random.randint(45, 110), "preference": "veg", "allergies": []}))),
+    ]
+
+
+def detect_scenario(paths):
+    images = []
+    for image in sorted(os.listdir(paths["images"])):
+        with open(os.path.join(paths["images"], image), "rb") as f:
+            images.append(multipart_body("image", image, f.read()))
+    return [("detect.upload", 1, lambda: ("POST", "/detect", *random.choice(images)))]
+
+
+SCENARIOS = {"backend": backend_scenario, "detect": detect_scenario}
+
+
+def json_body(payload):
+    return json.dumps(payload).encode(), {"Content-Type": "application/json"}
+
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def client(url, scenario, warm_until, stop_at, samples, seed):
+    rng = random.Random(seed)
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    names = [name for name, _, _ in scenario]
+    weights = [weight for _, weight, _ in scenario]
+    factories = {name: factory for name, _, factory in scenario}
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            break
+        name = rng.choices(names, weights)[0]
+        method, path, body, headers = factories[name]()
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            ok = False
+        elapsed = time.perf_counter() - start
+        if start >= warm_until:
+            samples.append((name, elapsed, ok))
+    conn.close()
+
+
+def start_service(service, paths, detector, port):
+    env = dict(os.environ, **fixtures.service_env(paths, detector), SERVE_PORT=str(port))
+    # Own session, so stop_service also reaches the Flask reloader's child
+    process = subprocess.Popen(SERVICES[service], cwd=BACKEND_DIR, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{service} exited with {process.returncode} during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_service(process)
+    raise RuntimeError(f"{service} did not come up on port {port}")
+
+
+def stop_service(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def run(url, scenario, concurrency, duration, warmup):
+    samples = []
+    begin = time.perf_counter()
+    warm_until, stop_at = begin + warmup, begin + warmup + duration
+    threads = [
+        threading.Thread(target=client, args=(url, scenario, warm_until, stop_at, samples, i), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for name in sorted({name for name, _, _ in samples}):
+        mine = [(elapsed, ok) for n, elapsed, ok in samples if n == name]
+        results[name] = report.summarize([e for e, _ in mine], duration, sum(not ok for _, ok in mine))
+    results["all"] = report.summarize([e for _, e, _ in samples], duration, sum(not ok for _, _, ok in samples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate concurrent load and report latency percentiles")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="backend")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="service to load (default: %(default)s)")
+    parser.add_argument("--start", choices=SERVICES, help="launch this service on the fixtures first")
+    parser.add_argument("--detector", default="stub", help="DETECT_BACKEND when starting detect")
+    parser.add_argument("--data", default=fixtures.DATA_DIR, help="fixture directory (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=100_000, help="catalog rows if fixtures are missing")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds (default: %(default)s)")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=fixtures.SEED)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    os.environ.update(fixtures.service_env(fixtures.data_paths(args.data), args.detector))
+    paths = fixtures.ensure(rows=args.rows, data_dir=args.data)
+    scenario = SCENARIOS[args.scenario](paths)
+
+    process = None
+    if args.start:
+        port = urllib.parse.urlsplit(args.url).port or 80
+        process = start_service(args.start, paths, args.detector, port)
+    try:
+        results = run(args.url, scenario, args.concurrency, args.duration, args.warmup)
+    finally:
+        if process is not None:
+            stop_service(process)
+
+    settings = {k: v for k, v in vars(args).items() if k != "out"}
+    report.write(args.out, "load", settings, results)
+    report.print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Per-handler micro-benchmarks, in process through the Flask test client.
+
+    python -m benchmarks.micro --out results/micro-before.json
+    python -m benchmarks.micro --filter medicine --seconds 2
+
+Each case is warmed up, then repeated until --iterations or --seconds runs
+out. Every response is checked for its expected status, so a handler that
+starts failing fast does not look like a speed-up. /detect runs on the
+stub detector unless --detector names a real backend.
+"""
+import argparse
+import io
+import os
+import time
+
+from benchmarks import fixtures, report
+
+DISEASE = "Asthma"
+SYMPTOM_TEXT = "I have had a fever and a bad cough with shortness of breath"
+
+
+def sample_names(csv_path, count=200):
+    import pandas as pd
+
+    return pd.read_csv(csv_path, usecols=["name"], nrows=count * 10)["name"].iloc[::10].tolist()
+
+
+def typo(name):
+    """Swap two letters in the middle of the first word"""
+    word = name.split()[0].lower()
+    i = max(1, len(word) // 2)
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:] if len(word) > 2 else word
+
+
+def backend_cases(client, paths):
+    names = sample_names(paths["csv"])
+    with open(paths["roster"], "rb") as f:
+        roster = f.read()
+    etag = client.get(f"/medicine/{names[0]}").headers.get("ETag", "")
+
+    def cycle(values):
+        state = {"i": 0}
+
+        def next_value():
+            state["i"] += 1
+            return values[state["i"] % len(values)]
+        return next_value
+
+    name = cycle(names)
+    return {
+        "medicine.search.prefix": (200, lambda: client.get(f"/search?query={name()[:4].lower()}")),
+        "medicine.search.fuzzy": (200, lambda: client.get(f"/search?query={typo(name())}&mode=fuzzy")),
+        "medicine.details": (200, lambda: client.get(f"/medicine/{name()}")),
+        "medicine.details.not_modified": (304, lambda: client.get(
+            f"/medicine/{names[0]}", headers={"If-None-Match": etag})),
+        "medicine.bulk": (200, lambda: client.post("/medicines", json={"names": names[:50]})),
+        "disease.symptoms": (200, lambda: client.get("/symptoms")),
+        "disease.search": (200, lambda: client.post("/search", json={"symptom": SYMPTOM_TEXT})),
+        "disease.search.batch": (200, lambda: client.post(
+            "/search/batch", json={"symptoms": [SYMPTOM_TEXT] * 100})),
+        "disease.pdf": (200, lambda: client.post("/pdf", json={"disease": DISEASE})),
+        "disease.pdf.page": (200, lambda: client.get(f"/pdf?disease={DISEASE}&page=1",
+                                                     headers={"Accept-Encoding": "gzip"})),
+        "disease.pdf.search": (200, lambda: client.get("/pdf/search?q=fever+treatment")),
+        "diet.generate": (200, lambda: client.post("/generate-plan", json={
+            "name": "A", "gender": "Female", "height": 165, "weight": 58, "preference": "veg", "allergies": []})),
+        "diet.bulk": (200, lambda: client.post("/generate-plan/bulk", data=roster, content_type="text/csv")),
+    }
+
+
+def detect_cases(client, paths):
+    cases = {}
+    for image in sorted(os.listdir(paths["images"])):
+        with open(os.path.join(paths["images"], image), "rb") as f:
+            data = f.read()
+        size = image.rsplit("_", 1)[-1].split(".")[0]
+        if f"detect.upload.{size}" in cases:
+            continue
+        cases[f"detect.upload.{size}"] = (200, lambda data=data: client.post(
+            "/detect", data={"image": (io.BytesIO(data), "capture.jpg")}, content_type="multipart/form-data"))
+    return cases
+
+
+def run_case(call, expected, iterations, seconds, warmup):
+    for _ in range(warmup):
+        call().close()
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while len(latencies) < iterations and time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = call()
+        response.get_data()  # Streamed bodies are only produced as they're read
+        latencies.append(time.perf_counter() - start)
+        response.close()
+        if response.status_code != expected:
+            errors += 1
+    return report.summarize(latencies, errors=errors)
+
+
+def load_apps():
+    """Import the services, with their warm-up finished"""
+    import importlib
+
+    backend = importlib.import_module("app")
+    detect = importlib.import_module("activity.detect")
+    for service in (backend, detect):
+        if service.warmup.enabled:
+            service.warmup.wait()
+        else:  # WARMUP=0 left everything to first use; load it untimed here
+            service.warmup.run()
+    return backend.app.test_client(), detect.app.test_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark every backend handler")
+    parser.add_argument("--data", default=fixtures.DATA_DIR, help="fixture directory (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=100_000, help="catalog rows if fixtures are missing")
+    parser.add_argument("--detector", default="stub", help="DETECT_BACKEND for /detect (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=500, help="max runs per case (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="time budget per case (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed runs per case (default: %(default)s)")
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    # Before anything imports the services: their paths are read at import time
+    os.environ.update(fixtures.service_env(fixtures.data_paths(args.data), args.detector))
+    paths = fixtures.ensure(rows=args.rows, data_dir=args.data)
+    backend_client, detect_client = load_apps()
+    cases = dict(backend_cases(backend_client, paths), **detect_cases(detect_client, paths))
+
+    results = {}
+    for name, (expected, call) in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = run_case(call, expected, args.iterations, args.seconds, args.warmup)
+    settings = {k: v for k, v in vars(args).items() if k != "out"}
+    report.write(args.out, "micro", settings, results)
+    report.print_table(results)
+
+
+if __name__ == "__main__":
+    main()
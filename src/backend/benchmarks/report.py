@@ -0,0 +1,61 @@
+"""Latency summaries and the JSON result files shared by every benchmark"""
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    """Percentiles (ms) of a list of latencies in seconds; throughput if `elapsed` is given"""
+    ms = np.asarray(latencies, dtype=float) * 1000
+    summary = {"count": int(len(ms)), "errors": int(errors)}
+    if len(ms):
+        summary.update({
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+        })
+    if elapsed:
+        summary["throughput_rps"] = round(len(ms) / elapsed, 2)
+    return summary
+
+
+def metadata(kind, settings):
+    """Where and how a run happened, so two result files can be compared fairly"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "kind": kind,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": settings,
+    }
+
+
+def write(path, kind, settings, results):
+    report = {"meta": metadata(kind, settings), "results": results}
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def print_table(results):
+    print(f"{'case':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>9} {'errors':>6}")
+    for name, r in results.items():
+        print(f"{name:<32} {r['count']:>7} {r.get('p50_ms', 0):>9.3f} {r.get('p95_ms', 0):>9.3f} "
+              f"{r.get('p99_ms', 0):>9.3f} {r.get('throughput_rps', 0):>9.1f} {r['errors']:>6}")
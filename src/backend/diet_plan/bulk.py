@@ -0,0 +1,147 @@
+"""Diet plans for whole rosters.
+
+A roster is CSV (header row) or NDJSON (one object per line) with the same
+fields as a /generate-plan body: name, gender, height (cm), weight (kg),
+preference and allergies (a list, or a ";"-separated string in CSV). It is
+read DIET_BULK_CHUNK rows at a time; BMI, category and plan links for a
+chunk are computed column-wise, and the plans go out as NDJSON, one line
+per input row in input order. Rows with a missing or non-positive height or
+weight produce {"row", "error"} instead of a plan.
+
+    python -m diet_plan.bulk roster.csv > plans.ndjson
+"""
+import argparse
+import heapq
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from diet_plan.plans import daily_schedule, diet_paths
+
+CHUNK_ROWS = int(os.environ.get("DIET_BULK_CHUNK", 5000))
+ROSTER_FORMATS = ("csv", "ndjson")
+ALLERGY_SEPARATOR = ";"
+
+# Same lookups as generate_plan, flattened for Series.map
+DIET_PDFS = {(c, p): paths[p] for c, paths in diet_paths.items() for p in ("veg", "non veg", "allergies")}
+EXERCISE_PDFS = {c: paths["exercise"] for c, paths in diet_paths.items()}
+
+
+def roster_format(content_type="", filename="", requested=None):
+    """Pick the roster format from an explicit choice, the file name or the content type"""
+    if requested:
+        return requested.lower()
+    if (filename or "").lower().endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or "") \
+            or "jsonl" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def read_roster(stream, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """Yield the roster as DataFrames of at most `chunk_rows` rows"""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "ndjson":
+        reader = pd.read_json(text, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+    else:
+        reader = pd.read_csv(text, chunksize=chunk_rows, dtype=str, keep_default_na=False, skipinitialspace=True)
+    with reader:
+        yield from reader
+
+
+def plan_chunk(df, first_row=0):
+    """Plans for one roster chunk as NDJSON lines, in row order"""
+    rows = pd.RangeIndex(first_row, first_row + len(df))
+    df = df.reset_index(drop=True)
+
+    def column(name, default=None):
+        return df[name] if name in df.columns else pd.Series(default, index=df.index, dtype=object)
+
+    height = pd.to_numeric(column("height"), errors="coerce").to_numpy(dtype=float)
+    weight = pd.to_numeric(column("weight"), errors="coerce").to_numpy(dtype=float)
+    valid = (height > 0) & (weight > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = np.round(weight / (height / 100) ** 2, 2)
+    category = np.select([bmi < 18.5, bmi <= 24.9], ["underweight", "normal"], "overweight")
+
+    preference = column("preference", "").fillna("").astype(str).str.strip().str.lower()
+    preference = np.where(preference == "non-veg", "non veg", np.where(preference == "veg", "veg", "allergies"))
+
+    plans = pd.DataFrame({
+        "row": rows,
+        "name": column("name"),
+        "gender": column("gender"),
+        "allergies": column("allergies").map(allergy_list),
+        "bmi": bmi,
+        "category": category,
+        "diet_pdf": pd.Series(list(zip(category, preference))).map(DIET_PDFS),
+        "exercise_pdf": pd.Series(category).map(EXERCISE_PDFS),
+    })[valid]
+    plans["schedule"] = [daily_schedule] * len(plans)
+    errors = pd.DataFrame({"row": rows[~valid], "error": "height and weight must be positive numbers"})
+
+    lines = to_lines(plans)
+    if errors.empty:
+        return lines
+    return [line for _, line in heapq.merge(
+        zip(plans["row"], lines), zip(errors["row"], to_lines(errors)), key=lambda item: item[0]
+    )]
+
+
+def allergy_list(value):
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str):
+        return []
+    return [a.strip() for a in value.split(ALLERGY_SEPARATOR) if a.strip()]
+
+
+def to_lines(df):
+    if df.empty:
+        return []
+    return df.to_json(orient="records", lines=True, force_ascii=False).splitlines()
+
+
+def stream_plans(stream, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """NDJSON plan lines (bytes) for a roster stream, one chunk in memory at a time"""
+    first_row = 0
+    try:
+        for chunk in read_roster(stream, fmt, chunk_rows):
+            lines = plan_chunk(chunk, first_row)
+            first_row += len(chunk)
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+    except pd.errors.EmptyDataError:
+        return
+    except ValueError as e:
+        # Headers are long gone by now; the last line carries the failure
+        yield (json.dumps({"row": first_row, "error": f"Could not read roster: {e}"}) + "\n").encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate diet plans for a CSV or NDJSON roster")
+    parser.add_argument("roster", help="roster file, or - for stdin")
+    parser.add_argument("--format", choices=ROSTER_FORMATS, help="roster format (default: from the file name)")
+    parser.add_argument("--out", help="output NDJSON file (default: stdout)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per chunk (default: %(default)s)")
+    args = parser.parse_args()
+
+    fmt = roster_format(filename=args.roster, requested=args.format)
+    source = sys.stdin.buffer if args.roster == "-" else open(args.roster, "rb")
+    target = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for block in stream_plans(source, fmt, args.chunk_rows):
+            target.write(block)
+    finally:
+        if args.out:
+            target.close()
+        if args.roster != "-":
+            source.close()
+
+
+if __name__ == "__main__":
+    main()
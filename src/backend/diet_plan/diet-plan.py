@@ -1,51 +1,39 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+import io
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from diet_plan.plans import daily_schedule, diet_paths
+from http_cache import CachedResponse
+from metrics import instrument
+from warmup import WarmUp, add_ready_route
 
 app = Flask(__name__)
 CORS(app)
+instrument(app)  # Route and stage latencies on /metrics
+
+# Plan documents and schedule, served with an ETag so clients can cache them
+diet_plans_response = CachedResponse.json({"diet_paths": diet_paths, "schedule": daily_schedule})
+
+# The bulk planner (pandas) loads on first use; the warm-up loads it ahead
+# of traffic and /ready reports when it's done (WARMUP=0 to skip)
+warmup = WarmUp()
+add_ready_route(app, warmup)
+
+@warmup.step("diet")
+def warm_diet():
+    from diet_plan.bulk import stream_plans
+
+    roster = b"name,gender,height,weight,preference,allergies\nA,Female,165,58,veg,\n"
+    for _ in stream_plans(io.BytesIO(roster), "csv"):
+        pass
 
 # Function to calculate BMI
 def calculate_bmi(weight, height):
     return round(weight / (height / 100) ** 2, 2)
 
-# Diet plan file paths
-diet_paths = {
-    'underweight': {
-        'veg': 'https://drive.google.com/file/d/1ZbdzjGxbvtbtwbDTgrC3GOVQ7oY0xAFP/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/1_ybJD9SPdpsSurPh_43qUSjRRm_UdmYO/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1tYr_QYXg_JgF2HHWpzMpAKEJdABs9Mhi/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/10XiahH3OKhfwjF0QiFGaZzKVU_rbuaHM/view?usp=drive_link'
-    },
-    'normal': {
-        'veg': 'https://drive.google.com/file/d/1XHuVFABwZSPae8-FxTWvJsFFhZ3VF2HI/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/1vCvvkLqjsa-pLFwKw1SOLts3vLGW-DHe/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1QYqAjBZC_ytnGRm5NicrjuEyzenV-cP5/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/1NlBUkGB08qz-Q6iTVA9B0UjnZFudqhY5/view?usp=drive_link'
-    },
-    'overweight': {
-        'veg': 'https://drive.google.com/file/d/1ZT9PypTF-D3PbAslQWk97vHxUKF3kWaC/view?usp=drive_link',
-        'non veg': 'https://drive.google.com/file/d/142lnQC_M2tkK5r560ic69HMMJ-c7hfrV/view?usp=drive_link',
-        'allergies': 'https://drive.google.com/file/d/1Tn9KM7XuAmUGgHMamqpMFMbmHNAEyeFc/view?usp=drive_link',
-        'exercise': 'https://drive.google.com/file/d/1JvvVXospzj3E4SkPLX-5EoOSigcGp1Gl/view?usp=drive_link'
-    }
-}
-
-# Health Schedule
-daily_schedule = [
-    "06:30 AM - Wake Up",
-    "07:00 AM - Morning Walk",
-    "07:30 AM - Exercise",
-    "08:00 AM - Breakfast",
-    "10:30 AM - Mid-Morning Snack",
-    "01:00 PM - Lunch",
-    "04:00 PM - Evening Snack",
-    "08:00 PM - Dinner",
-    "Hydration Reminder - Every 30 Minutes",
-    "05:00 PM - Hobby Time",
-    "10:00 PM - Sleep Time"
-]
-
 # API to generate a plan
 @app.route('/generate-plan', methods=['POST'])
 def generate_plan():
@@ -81,6 +69,34 @@ def generate_plan():
         "schedule": daily_schedule
     })
 
+# API to generate plans for a whole roster
+@app.route('/generate-plan/bulk', methods=['POST'])
+def generate_plan_bulk():
+    """Plans for a CSV / NDJSON roster (raw body or a "roster" file), streamed as NDJSON"""
+    from diet_plan.bulk import ROSTER_FORMATS, roster_format, stream_plans  # Loads pandas
+
+    if request.args.get('format', 'csv').lower() not in ROSTER_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(ROSTER_FORMATS)}"}), 400
+
+    @stream_with_context
+    def plans():
+        # Read the upload in here: uploaded files are closed once the view returns
+        upload = request.files.get('roster')
+        if upload:
+            fmt = roster_format(upload.mimetype, upload.filename, request.args.get('format'))
+            yield from stream_plans(upload.stream, fmt)
+        else:
+            yield from stream_plans(request.stream, roster_format(request.content_type, requested=request.args.get('format')))
+
+    return Response(plans(), mimetype='application/x-ndjson')
+
+@app.route('/diet-plans', methods=['GET'])
+def get_diet_plans():
+    """Every plan document per category and the daily schedule, for clients to cache"""
+    return diet_plans_response.response()
+
+warmup.start()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
 
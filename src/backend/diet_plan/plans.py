@@ -0,0 +1,38 @@
+"""Diet plan documents per BMI category, shared by the single and bulk endpoints"""
+
+# Diet plan file paths
+diet_paths = {
+    'underweight': {
+        'veg': 'https://drive.google.com/file/d/1ZbdzjGxbvtbtwbDTgrC3GOVQ7oY0xAFP/view?usp=drive_link',
+        'non veg': 'https://drive.google.com/file/d/1_ybJD9SPdpsSurPh_43qUSjRRm_UdmYO/view?usp=drive_link',
+        'allergies': 'https://drive.google.com/file/d/1tYr_QYXg_JgF2HHWpzMpAKEJdABs9Mhi/view?usp=drive_link',
+        'exercise': 'https://drive.google.com/file/d/10XiahH3OKhfwjF0QiFGaZzKVU_rbuaHM/view?usp=drive_link'
+    },
+    'normal': {
+        'veg': 'https://drive.google.com/file/d/1XHuVFABwZSPae8-FxTWvJsFFhZ3VF2HI/view?usp=drive_link',
+        'non veg': 'https://drive.google.com/file/d/1vCvvkLqjsa-pLFwKw1SOLts3vLGW-DHe/view?usp=drive_link',
+        'allergies': 'https://drive.google.com/file/d/1QYqAjBZC_ytnGRm5NicrjuEyzenV-cP5/view?usp=drive_link',
+        'exercise': 'https://drive.google.com/file/d/1NlBUkGB08qz-Q6iTVA9B0UjnZFudqhY5/view?usp=drive_link'
+    },
+    'overweight': {
+        'veg': 'https://drive.google.com/file/d/1ZT9PypTF-D3PbAslQWk97vHxUKF3kWaC/view?usp=drive_link',
+        'non veg': 'https://drive.google.com/file/d/142lnQC_M2tkK5r560ic69HMMJ-c7hfrV/view?usp=drive_link',
+        'allergies': 'https://drive.google.com/file/d/1Tn9KM7XuAmUGgHMamqpMFMbmHNAEyeFc/view?usp=drive_link',
+        'exercise': 'https://drive.google.com/file/d/1JvvVXospzj3E4SkPLX-5EoOSigcGp1Gl/view?usp=drive_link'
+    }
+}
+
+# Health Schedule
+daily_schedule = [
+    "06:30 AM - Wake Up",
+    "07:00 AM - Morning Walk",
+    "07:30 AM - Exercise",
+    "08:00 AM - Breakfast",
+    "10:30 AM - Mid-Morning Snack",
+    "01:00 PM - Lunch",
+    "04:00 PM - Evening Snack",
+    "08:00 PM - Dinner",
+    "Hydration Reminder - Every 30 Minutes",
+    "05:00 PM - Hobby Time",
+    "10:00 PM - Sleep Time"
+]
@@ -1,10 +1,25 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
-import PyPDF2
+import threading
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from disease_overview.fulltext import FullTextIndex
+from disease_overview.pdf_cache import PdfTextCache, file_version, page_span, resolve_pdf
+from disease_overview.symptom_matcher import MAX_BATCH, SymptomMatcher
+from http_cache import CachedResponse, ResponseCache
+from metrics import instrument, stage
+from warmup import Lazy, WarmUp, add_ready_route
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})  # Allows React frontend to communicate with Flask backend
+instrument(app)  # Route and stage latencies on /metrics
+
+# The PDF index loads on first use; the warm-up loads it and extracts every
+# PDF ahead of traffic, and /ready reports when it's done (WARMUP=0 to skip)
+warmup = WarmUp()
+add_ready_route(app, warmup)
 
 # Define disease data
 disease_data = {
@@ -34,37 +49,90 @@ disease_data = {
 
 # Collect all unique symptoms
 all_symptoms = sorted(set(symptom for data in disease_data.values() for symptom in data["symptoms"]))
+symptom_matcher = SymptomMatcher(disease_data)
+
+# Extracted PDF text, persisted across restarts
+pdf_texts = PdfTextCache()
+
+def load_pdf_search():
+    """Full-text index over every PDF in the folder, refreshed incrementally"""
+    index = FullTextIndex(pdf_texts)
+    threading.Thread(target=index.refresh, daemon=True).start()
+    return index
+
+pdf_search = Lazy(load_pdf_search)
+
+@warmup.step("disease")
+def warm_disease():
+    pdf_texts.warm(resolve_pdf(info["pdf"]) for info in disease_data.values())
+    pdf_search.get().refresh()
+pdf_diseases = {
+    os.path.splitext(os.path.basename(resolve_pdf(info["pdf"])))[0]: d for d, info in disease_data.items()
+}
+
+# Serialized, hashed and compressed once; keyed by file version and page range
+symptoms_response = CachedResponse.json(all_symptoms)
+pdf_responses = ResponseCache()
 
 @app.route("/symptoms", methods=["GET"])
 def get_symptoms():
-    return jsonify(all_symptoms)
+    return symptoms_response.response()
 
 @app.route("/search", methods=["POST"])
 def search_disease():
     data = request.json
-    symptom_input = data.get("symptom", "").lower()
-
-    detected_diseases = [
-        d for d, info in disease_data.items() if any(s in symptom_input for s in info["symptoms"])
-    ]
+    symptom_input = data.get("symptom", "")
+    return jsonify(symptom_matcher.search(symptom_input))
 
-    return jsonify({"diseases": detected_diseases})
+@app.route("/search/batch", methods=["POST"])
+def search_disease_batch():
+    inputs = (request.json or {}).get("symptoms")
+    if not isinstance(inputs, list) or not all(isinstance(s, str) for s in inputs):
+        return jsonify({"error": "symptoms must be a list of strings"}), 400
+    if len(inputs) > MAX_BATCH:
+        return jsonify({"error": f"At most {MAX_BATCH} inputs per request"}), 400
+    return jsonify({"results": [symptom_matcher.search(s) for s in inputs]})
 
-@app.route("/pdf", methods=["POST"])
+@app.route("/pdf", methods=["GET", "POST"])
 def get_pdf_content():
-    data = request.json
+    # GET takes the same fields as query parameters, so clients can revalidate
+    data = request.args if request.method == "GET" else request.json
     disease = data.get("disease")
 
     if disease in disease_data:
-        pdf_path = disease_data[disease]["pdf"]
+        pdf_path = resolve_pdf(disease_data[disease]["pdf"])
         if os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
-                text = "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
-            return jsonify({"content": text})
+            with stage("pdf_parse"):  # Only a cache read once the text is extracted
+                pages = pdf_texts.pages(pdf_path)
+            span = page_span(data, len(pages))
+            if span is None:
+                return jsonify({"error": f"Invalid page range, document has {len(pages)} pages"}), 400
+            start, end = span
+
+            def build():
+                text = "\n".join(page for page in pages[start - 1:end] if page)
+                return CachedResponse.json({"content": text, "pages": len(pages), "start_page": start, "end_page": end})
+
+            return pdf_responses.get((pdf_path, file_version(pdf_path), start, end), build).response()
         return jsonify({"error": "PDF not found"}), 404
 
     return jsonify({"error": "Disease not found"}), 400
 
+@app.route("/pdf/search", methods=["GET"])
+def search_pdf_text():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"results": []})
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    results = pdf_search.get().search(query, limit)
+    for result in results:
+        result["disease"] = pdf_diseases.get(result["document"])
+    return jsonify({"results": results})
+
+warmup.start()
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5002, debug=True)
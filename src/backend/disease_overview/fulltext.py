@@ -0,0 +1,154 @@
+"""BM25 full-text search over the disease PDF corpus.
+
+Every PDF in PDF_DIR is tokenized once per file version; per-document term
+frequencies are persisted next to the extracted text cache, so a restart
+only re-tokenizes files that changed. Queries are answered from an
+in-memory inverted index built from those frequencies.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+from disease_overview.pdf_cache import CACHE_DIR, PDF_DIR, pdf_files
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.path.join(CACHE_DIR, "fulltext.json")
+INDEX_FORMAT = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_CHARS = 200
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have in is it its may of on or "
+    "that the their this to was were which with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class FullTextIndex:
+    """Inverted index over the text that `pdf_texts` extracts from `pdf_dir`"""
+
+    def __init__(self, pdf_texts, pdf_dir=PDF_DIR, index_path=INDEX_PATH):
+        self.pdf_texts = pdf_texts
+        self.pdf_dir = pdf_dir
+        self.index_path = index_path
+        self.refresh_lock = threading.Lock()
+        self._build(self._load())
+
+    def refresh(self):
+        """Re-tokenize new or changed PDFs, drop deleted ones, and persist"""
+        with self.refresh_lock:
+            docs = {}
+            changed = False
+            for path in pdf_files(self.pdf_dir):
+                doc_id = os.path.splitext(os.path.basename(path))[0]
+                st = os.stat(path)
+                version = [st.st_mtime_ns, st.st_size]
+                old = self.state[0].get(doc_id)
+                if old and old["version"] == version:
+                    docs[doc_id] = old
+                    continue
+                try:
+                    terms = tokenize("\n".join(self.pdf_texts.pages(path)))
+                except Exception:
+                    logger.exception("Failed to index %s", path)
+                    continue
+                tf = {}
+                for term in terms:
+                    tf[term] = tf.get(term, 0) + 1
+                docs[doc_id] = {"file": os.path.basename(path), "version": version, "length": len(terms), "tf": tf}
+                changed = True
+            if changed or docs.keys() != self.state[0].keys():
+                self._build(docs)
+                self._save(docs)
+
+    def search(self, query, limit=10):
+        """Return up to `limit` documents ranked by BM25 score for `query`"""
+        docs, postings, avg_len = self.state
+        terms = set(tokenize(query))
+        scores = {}
+        for term in terms:
+            hits = postings.get(term)
+            if not hits:
+                continue
+            idf = math.log(1 + (len(docs) - len(hits) + 0.5) / (len(hits) + 0.5))
+            for doc_id, tf in hits:
+                norm = K1 * (1 - B + B * docs[doc_id]["length"] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        results = []
+        for doc_id, score in ranked:
+            snippet, highlights = self._snippet(os.path.join(self.pdf_dir, docs[doc_id]["file"]), terms)
+            results.append({
+                "document": doc_id,
+                "score": round(score, 4),
+                "snippet": snippet,
+                "highlights": highlights,
+            })
+        return results
+
+    def _snippet(self, path, terms):
+        """Best window of the document around query terms.
+
+        Returns the snippet text and [start, end) offsets of every matched
+        term inside it.
+        """
+        text = " ".join(" ".join(self.pdf_texts.pages(path)).split())
+        matches = [m for m in TOKEN_RE.finditer(text.lower()) if m.group() in terms]
+        if not matches:
+            return text[:SNIPPET_CHARS], []
+
+        # Window start that covers the most matches
+        best, best_count, j = 0, 0, 0
+        for i, m in enumerate(matches):
+            while matches[j].start() < m.end() - SNIPPET_CHARS:
+                j += 1
+            if i - j + 1 > best_count:
+                best, best_count = j, i - j + 1
+        start = max(0, matches[best].start() - 20)
+        start = text.rfind(" ", 0, start) + 1 if start else 0
+        end = min(len(text), start + SNIPPET_CHARS)
+        highlights = [
+            [m.start() - start, m.end() - start]
+            for m in matches if m.start() >= start and m.end() <= end
+        ]
+        return text[start:end], highlights
+
+    def _build(self, docs):
+        postings = {}
+        for doc_id, doc in docs.items():
+            for term, tf in doc["tf"].items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        total = sum(doc["length"] for doc in docs.values())
+        avg_len = total / len(docs) if total else 1.0
+        # Swapped as one tuple so searches never see a half-built index
+        self.state = (docs, postings, avg_len)
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data["docs"] if data.get("format") == INDEX_FORMAT else {}
+
+    def _save(self, docs):
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"format": INDEX_FORMAT, "docs": docs}, f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            logger.exception("Could not persist full-text index to %s", self.index_path)
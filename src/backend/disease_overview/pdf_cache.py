@@ -0,0 +1,152 @@
+"""Extracted text of the disease PDFs, cached on disk and in memory.
+
+Extraction happens once per file version: results are persisted as JSON
+keyed by the PDF's mtime and size, and the most recently used documents
+are kept in an in-memory LRU. Pre-extract everything ahead of time with,
+from src/backend:
+
+    python -m disease_overview.pdf_cache
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PDF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PDF")
+CACHE_DIR = os.environ.get(
+    "PDF_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdf_cache")
+)
+# Documents kept in memory
+CACHE_SIZE = int(os.environ.get("PDF_CACHE_SIZE", 32))
+
+
+def resolve_pdf(path):
+    """Return `path`, or the file of the same name in PDF_DIR if it isn't there.
+
+    Lets the absolute paths in `disease_data` work on any machine.
+    """
+    if os.path.exists(path):
+        return path
+    return os.path.join(PDF_DIR, os.path.basename(path.replace("\\", "/")))
+
+
+def file_version(path):
+    """(mtime_ns, size): changes whenever the file is replaced or edited"""
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def extract_pages(path):
+    import PyPDF2
+
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+class PdfTextCache:
+    """Per-page text of PDF files, extracted at most once per file version"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pages(self, path):
+        """Return the text of every page of `path` (empty string for blank pages)"""
+        path = os.path.abspath(path)
+        version = file_version(path)
+
+        with self.lock:
+            entry = self.memory.get(path)
+            if entry and entry[0] == version:
+                self.memory.move_to_end(path)
+                return entry[1]
+
+        pages = self._read_disk(path, version)
+        if pages is None:
+            pages = extract_pages(path)
+            self._write_disk(path, version, pages)
+
+        with self.lock:
+            self.memory[path] = (version, pages)
+            self.memory.move_to_end(path)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+        return pages
+
+    def warm(self, paths):
+        """Extract (or load from disk) every file in `paths`, skipping failures"""
+        for path in paths:
+            try:
+                self.pages(path)
+            except Exception:
+                logger.exception("Failed to extract %s", path)
+
+    def _cache_file(self, path):
+        return os.path.join(self.cache_dir, hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_disk(self, path, version):
+        try:
+            with open(self._cache_file(path), encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (cached.get("mtime_ns"), cached.get("size")) != version:
+            return None
+        return cached["pages"]
+
+    def _write_disk(self, path, version, pages):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            target = self._cache_file(path)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"path": path, "mtime_ns": version[0], "size": version[1], "pages": pages}, f)
+            os.replace(tmp, target)
+        except OSError:
+            logger.exception("Could not persist extracted text for %s", path)
+
+
+def page_span(data, total):
+    """Read `page` or `start_page`/`end_page` (1-based, inclusive) from a request.
+
+    Defaults to the whole document; `end_page` past the end is clamped.
+    Returns (start, end) or None if the range is invalid.
+    """
+    try:
+        if data.get("page") is not None:
+            start = end = int(data["page"])
+        else:
+            # An explicit 0 is a bad page, not a missing one
+            start = 1 if data.get("start_page") is None else int(data["start_page"])
+            end = total if data.get("end_page") is None else min(int(data["end_page"]), total)
+    except (TypeError, ValueError):
+        return None
+    if total == 0 and start == 1 and end == 0:
+        return start, end
+    if not 1 <= start <= end <= total:
+        return None
+    return start, end
+
+
+def pdf_files(directory=PDF_DIR):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".pdf")
+    )
+
+
+def main():
+    cache = PdfTextCache()
+    for path in pdf_files():
+        pages = cache.pages(path)
+        print(f"{os.path.basename(path)}: {len(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
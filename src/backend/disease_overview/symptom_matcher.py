@@ -0,0 +1,87 @@
+from collections import deque
+
+# Most free-text inputs a single batch request may score
+MAX_BATCH = 1000
+
+
+class SymptomMatcher:
+    """Aho-Corasick automaton over every symptom phrase in `disease_data`.
+
+    Finds all symptoms occurring anywhere in a text in one pass over it -
+    the same substring semantics as `s in text`, without a scan per symptom
+    per disease.
+    """
+
+    def __init__(self, disease_data):
+        self.diseases = list(disease_data)
+        self.symptom_count = {d: len(set(info["symptoms"])) for d, info in disease_data.items()}
+        self.symptoms = sorted({s.lower() for info in disease_data.values() for s in info["symptoms"]})
+        self.symptom_diseases = {s: [] for s in self.symptoms}
+        for d, info in disease_data.items():
+            for s in dict.fromkeys(x.lower() for x in info["symptoms"]):
+                self.symptom_diseases[s].append(d)
+
+        # Trie of symptom phrases; node 0 is the root
+        self.goto = [{}]
+        self.output = [[]]
+        for i, phrase in enumerate(self.symptoms):
+            node = 0
+            for ch in phrase:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.output.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node].append(i)
+
+        # Failure links, breadth first; each node also inherits the outputs
+        # of its failure node so matching never has to walk the chain
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """Return the set of symptom phrases occurring in `text`"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+        return {self.symptoms[i] for i in found}
+
+    def rank(self, text):
+        """Diseases with at least one symptom in `text`, best coverage first.
+
+        Each entry lists the matched symptoms and the fraction of the
+        disease's symptoms they cover; ties keep `disease_data` order.
+        """
+        matched = {}
+        for symptom in sorted(self.find(text)):
+            for d in self.symptom_diseases[symptom]:
+                matched.setdefault(d, []).append(symptom)
+        order = {d: i for i, d in enumerate(self.diseases)}
+        ranked = sorted(
+            matched.items(),
+            key=lambda item: (-len(item[1]) / self.symptom_count[item[0]], -len(item[1]), order[item[0]]),
+        )
+        return [
+            {"disease": d, "matched": symptoms, "coverage": round(len(symptoms) / self.symptom_count[d], 3)}
+            for d, symptoms in ranked
+        ]
+
+    def search(self, text):
+        """The /search response body for one free-text input"""
+        matches = self.rank(text)
+        return {"diseases": [m["disease"] for m in matches], "matches": matches}
@@ -0,0 +1,119 @@
+"""HTTP caching for responses that only change between deploys or data versions.
+
+A `CachedResponse` is serialized, hashed and (above MIN_COMPRESS_BYTES)
+gzip / brotli compressed once, then served from memory: the body carries a
+content-hash ETag and Cache-Control, a GET or HEAD whose If-None-Match
+matches gets a bare 304, and the encoding is picked from Accept-Encoding.
+`ResponseCache` keeps an LRU of them for keyed responses (one medicine, one
+PDF page range) so a hit skips building the body altogether. Brotli is used
+when the `brotli` package is installed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+from metrics import stage
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", 300))
+CACHE_SIZE = int(os.environ.get("HTTP_CACHE_SIZE", 512))
+MIN_COMPRESS_BYTES = 1024
+
+
+class CachedResponse:
+    """One response body with its ETag and pre-compressed encodings"""
+
+    def __init__(self, body, mimetype="application/json", status=200):
+        self.mimetype = mimetype
+        self.status = status
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.encodings = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            with stage("compress"):
+                if brotli is not None:
+                    self.encodings["br"] = brotli.compress(body, quality=11)
+                self.encodings["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+
+    @classmethod
+    def json(cls, payload, status=200):
+        with stage("json_encode"):
+            body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        return cls(body, status=status)
+
+    def response(self, max_age=MAX_AGE):
+        """Build the Flask response for the current request"""
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+            "Vary": "Accept-Encoding",
+        }
+        if request.method in ("GET", "HEAD") and etag_matches(request.headers.get("If-None-Match"), self.etag):
+            return Response(status=304, headers=headers)
+
+        encoding = self.encoding_for(request.headers.get("Accept-Encoding", ""))
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.encodings[encoding], status=self.status, mimetype=self.mimetype, headers=headers)
+
+    def encoding_for(self, accept_encoding):
+        accepted = set()
+        for part in accept_encoding.split(","):
+            name, _, params = part.partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    if float(params[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+
+class ResponseCache:
+    """LRU of CachedResponses; `key` must change whenever the content would"""
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        """Return the cached response for `key`, calling `build()` on a miss.
+
+        `build` returns a CachedResponse, or None for nothing to cache.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        entry = build()
+        if entry is None:
+            return None
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
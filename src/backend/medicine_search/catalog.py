@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from medicine_search import snapshot
+
+logger = logging.getLogger(__name__)
+
+# Source CSV and the compiled snapshot built from it (see snapshot.py)
+CSV_PATH = os.environ.get(
+    "MEDICINE_CSV",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "updated_indian_medicine_data.csv"),
+)
+SNAPSHOT_PATH = os.environ.get("MEDICINE_SNAPSHOT", os.path.splitext(CSV_PATH)[0] + ".snapshot")
+# Seconds between checks for a newly published snapshot
+RELOAD_INTERVAL = float(os.environ.get("MEDICINE_RELOAD_INTERVAL", 5))
+
+# Suggestions returned when the client doesn't ask for a page size, and the
+# hard cap on what a single request may ask for
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Most names a single bulk lookup may resolve
+MAX_BULK = 200
+
+# Fuzzy search: character n-gram size, how many candidates survive the
+# n-gram overlap pruning, and grams shared by more than this fraction of the
+# catalog ("tab", "syr", ...) that are ignored when rarer ones are available
+NGRAM = 3
+MAX_CANDIDATES = 64
+STOP_FRACTION = 0.1
+
+# "auto" serves prefix matches and only goes fuzzy when there are none
+SEARCH_MODES = ("auto", "prefix", "fuzzy")
+
+
+class MedicineIndex:
+    """Lookup structures over the medicine catalog.
+
+    Built from a DataFrame with `from_frame`, or loaded ready-made from a
+    compiled snapshot (see snapshot.py). Every structure only needs to be
+    indexable (and `grams` and `ids` searchable), so a snapshot can serve
+    them all straight from memory-mapped files.
+    """
+
+    def __init__(self, keys, names, details, fuzzy_texts, grams, ids=None):
+        self.keys = keys
+        self.names = names
+        self.details = details
+        self.fuzzy_texts = fuzzy_texts
+        self.grams = grams
+        # Exact-name lookups are a single hit, key -> id, into ready-to-send JSON
+        self.ids = {key: i for i, key in enumerate(keys)} if ids is None else ids
+
+    @classmethod
+    def from_frame(cls, df, fuzzy_columns=("name",)):
+        names = [n.replace("\n", " ") for n in df["name"].astype(str).tolist()]
+
+        # One entry per lowercased name; duplicates keep their first row,
+        # same as the old `iloc[0]` lookup did
+        first_row = {}
+        for row, name in enumerate(names):
+            first_row.setdefault(name.lower(), row)
+        keys = sorted(first_row)
+        rows = [first_row[key] for key in keys]
+
+        records = df.to_dict(orient="records")
+        details = [
+            json.dumps(records[row], separators=(",", ":")).encode("utf-8") for row in rows
+        ]
+
+        # Fuzzy search texts per unique name and an n-gram -> ids posting list
+        columns = [
+            df[c].astype(str).str.lower().str.replace("\n", " ").tolist() for c in fuzzy_columns
+        ]
+        fuzzy_texts = [
+            list(dict.fromkeys(col[row] for col in columns if col[row] != "not available"))
+            for row in rows
+        ]
+        postings = {}
+        for i, texts in enumerate(fuzzy_texts):
+            for gram in set().union(*(text_ngrams(t) for t in texts)):
+                postings.setdefault(gram, []).append(i)
+        grams = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+
+        return cls(keys, [names[row] for row in rows], details, fuzzy_texts, grams)
+
+    def prefix(self, query, limit=DEFAULT_LIMIT, offset=0):
+        """Return names starting with `query` in lowercase sort order.
+
+        The matching range is found with two binary searches over the sorted
+        keys, so the cost grows with the page size rather than the catalog.
+        An exact match always sorts first within its range.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        lo = bisect_left(self.keys, query)
+        hi = bisect_right(self.keys, query + "\uffff", lo)
+        start = min(lo + offset, hi)
+        return self.names[start:min(start + limit, hi)]
+
+    def fuzzy(self, query, limit=DEFAULT_LIMIT, offset=0):
+        """Return names close to `query`, tolerating a few typos.
+
+        Candidates are the names sharing the most n-grams with the query,
+        looked up through the inverted index; only those are re-ranked by
+        edit distance between the query and the start of the name (or of any
+        word in it). Returns (name, distance) pairs, best first.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        max_dist = max_distance(query)
+
+        grams = sorted(
+            (self.grams[g] for g in query_ngrams(query) if g in self.grams), key=len
+        )
+        common = len(self.keys) * STOP_FRACTION
+        rare = [ids for ids in grams if len(ids) <= common]
+        if len(rare) >= 2:
+            grams = rare
+        if not grams:
+            return []
+
+        # Each edit destroys at most NGRAM of the query's grams
+        ids, counts = np.unique(np.concatenate(grams), return_counts=True)
+        keep = counts >= max(1, len(grams) - NGRAM * max_dist)
+        ids, counts = ids[keep], counts[keep]
+        # Among equal overlaps, names with a word starting like the query go first
+        anchor = " " * (NGRAM - 2) + query[:2]
+        starts = np.isin(ids, self.grams[anchor]) if anchor in self.grams else np.zeros(len(ids), bool)
+        order = np.lexsort((~starts, -counts))[:MAX_CANDIDATES]
+
+        # Best overlap first; stop once the grams a candidate is missing
+        # guarantee it can't beat the page we already have
+        wanted = offset + limit
+        masks = pattern_masks(query)
+        ranked = []
+        for i, overlap in zip(ids[order].tolist(), counts[order].tolist()):
+            if len(ranked) >= wanted:
+                ranked.sort()
+                if -(-(len(grams) - overlap) // NGRAM) > ranked[wanted - 1][0]:
+                    break
+            dist = min(word_distance(query, t, max_dist, masks) for t in self.fuzzy_texts[i])
+            if dist <= max_dist:
+                ranked.append((dist, -overlap, len(self.keys[i]), self.keys[i], i))
+        ranked.sort()
+        return [(self.names[r[-1]], r[0]) for r in ranked[offset:offset + limit]]
+
+    def search(self, query, mode="auto", limit=DEFAULT_LIMIT, offset=0):
+        """Suggestions as {"name": ...} dicts; fuzzy hits also carry a distance"""
+        if mode == "prefix" or (mode == "auto" and self.prefix(query, 1)):
+            return [{"name": n} for n in self.prefix(query, limit, offset)]
+        return [{"name": n, "distance": d} for n, d in self.fuzzy(query, limit, offset)]
+
+    def get(self, name):
+        """Return the pre-serialized JSON details for `name`, or None"""
+        i = self.ids.get(name.strip().lower())
+        return None if i is None else self.details[i]
+
+    def bulk(self, names):
+        """Resolve many names at once into a single JSON body.
+
+        Details come back in request order with `null` for unknown names,
+        which are also listed under "missing".
+        """
+        found = []
+        missing = []
+        for name in names:
+            record = self.get(name)
+            if record is None:
+                missing.append(name)
+                record = b"null"
+            found.append(record)
+        return b"".join([
+            b'{"medicines":[', b",".join(found), b'],"missing":',
+            json.dumps(missing).encode("utf-8"), b"}",
+        ])
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class CatalogStore:
+    """Holds the live MedicineIndex and hot-swaps in newly published snapshots.
+
+    Handlers call `current()` once per request and keep using what they got,
+    so a swap never disturbs requests already in flight. The reload itself
+    runs on a background thread; at most one check happens per interval.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, csv_path=CSV_PATH, reload_interval=RELOAD_INTERVAL):
+        self.snapshot_path = snapshot_path
+        self.csv_path = csv_path
+        self.reload_interval = reload_interval
+        self.build = snapshot.current_build(snapshot_path)
+        self.index = None
+        if self.build:
+            try:
+                self.index = snapshot.read_index(os.path.join(snapshot_path, self.build))
+            except ValueError:  # Written by an older version; republish it
+                logger.exception("Can't read medicine snapshot %s", self.build)
+                self.build = None
+        if self.index is None:
+            logger.warning("No snapshot at %s, indexing %s directly", snapshot_path, csv_path)
+            self.index = MedicineIndex.from_frame(read_catalog_csv(csv_path))
+        self._next_check = time.monotonic() + reload_interval
+        self._checking = threading.Lock()
+
+    def current(self):
+        if time.monotonic() >= self._next_check and self._checking.acquire(blocking=False):
+            threading.Thread(target=self._reload, daemon=True).start()
+        return self.index
+
+    def _reload(self):
+        try:
+            build = snapshot.current_build(self.snapshot_path)
+            if build and build != self.build:
+                index = snapshot.read_index(os.path.join(self.snapshot_path, build))
+                self.index, self.build = index, build
+                logger.info("Swapped in medicine snapshot %s (%d names)", build, len(index))
+        except Exception:
+            logger.exception("Failed to reload medicine snapshot from %s", self.snapshot_path)
+        finally:
+            self._next_check = time.monotonic() + self.reload_interval
+            self._checking.release()
+
+
+def read_catalog_csv(path=CSV_PATH):
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    # Object dtype first so numeric columns can take the placeholder too
+    return df.astype(object).fillna("Not Available")
+
+
+def text_ngrams(text):
+    """N-grams of a catalog text, with every word also padded as a start"""
+    grams = query_ngrams(text)
+    for word in text.split():
+        grams |= query_ngrams(word)
+    return grams
+
+
+def query_ngrams(text):
+    # Only the front is padded so a partly typed name still matches fully
+    padded = " " * (NGRAM - 1) + text
+    return {padded[i:i + NGRAM] for i in range(len(text))}
+
+
+def max_distance(query):
+    """Typos tolerated for a query of this length"""
+    if len(query) <= 4:
+        return 1
+    if len(query) <= 8:
+        return 2
+    return 3
+
+
+def pattern_masks(query):
+    """Bit mask of the positions of each character in `query`, for prefix_distance"""
+    masks = {}
+    for i, ch in enumerate(query):
+        masks[ch] = masks.get(ch, 0) | 1 << i
+    return masks
+
+
+def prefix_distance(query, text, max_dist, masks=None):
+    """Smallest edit distance between `query` and any prefix of `text`.
+
+    Bit-parallel (Myers / Hyyro): each character of `text` advances a whole
+    column of the edit-distance table, kept as bit vectors over `query`, in
+    a handful of integer operations; the bottom cell of each column is the
+    distance to that prefix. Anything over `max_dist` comes back as
+    max_dist + 1. Pass `masks` (pattern_masks(query)) to reuse them.
+    """
+    if not query:
+        return 0
+    if masks is None:
+        masks = pattern_masks(query)
+    full = (1 << len(query)) - 1
+    last = 1 << (len(query) - 1)
+    pv, mv = full, 0
+    score = best = len(query)
+    for ch in text[:len(query) + max_dist]:
+        eq = masks.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+            if score < best:
+                best = score
+        # The top row counts up: the query has to start where `text` does
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return min(best, max_dist + 1)
+
+
+def word_distance(query, text, max_dist, masks=None):
+    """prefix_distance against the start of `text` or of any word in it"""
+    if masks is None:
+        masks = pattern_masks(query)
+    best = prefix_distance(query, text, max_dist, masks)
+    start = text.find(" ")
+    while best and start != -1:
+        best = min(best, prefix_distance(query, text[start + 1:], max_dist, masks))
+        start = text.find(" ", start + 1)
+    return best
+
+
+def page_args(args):
+    """Read `limit`/`offset` query parameters, clamped to sane bounds"""
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+        offset = int(args.get("offset", 0))
+    except ValueError:
+        return None
+    return max(1, min(limit, MAX_LIMIT)), max(0, offset)
@@ -1,34 +1,79 @@
-from flask import Flask, request, jsonify
-import pandas as pd
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import CachedResponse, ResponseCache
+from medicine_search.catalog import MAX_BULK, SEARCH_MODES, CatalogStore, page_args
+from metrics import instrument, stage
+from warmup import Lazy, WarmUp, add_ready_route
 
 app = Flask(__name__)
 CORS(app) 
+instrument(app)  # Route and stage latencies on /metrics
+
+# The compiled catalog snapshot (falls back to the CSV); new snapshots
+# published with `python -m medicine_search.snapshot` are picked up live.
+# Loaded on first use, or by the warm-up, which /ready waits for
+catalog = Lazy(CatalogStore)
+medicine_responses = ResponseCache()  # Per snapshot build and name
+warmup = WarmUp()
+add_ready_route(app, warmup)
 
-# Load dataset
-file_path = r"C:\VISHNU_VIT\SEM\SEM 8\Capstone\wellifo\src\backend\medicine_search\updated_indian_medicine_data.csv"
-df = pd.read_csv(file_path)
-df.fillna("Not Available", inplace=True)  # Replace NaN values with "Not Available"
+@warmup.step("medicine")
+def warm_medicine():
+    # Page in the snapshot's name list, details and n-gram postings
+    index = catalog.get().current()
+    index.search("pa", "prefix")
+    index.search("paracetmol", "fuzzy")
 
 @app.route("/search", methods=["GET"])
 def search_medicine():
-    """Return medicine names that start with the query"""
+    """Return medicine names matching the query, paged by limit/offset"""
     query = request.args.get("query", "").strip().lower()
     if not query:
         return jsonify([])
-    filtered_df = df[df["name"].str.lower().str.startswith(query)]
-    suggestions = filtered_df[["name"]].to_dict(orient="records")
-    return jsonify(suggestions)
+    page = page_args(request.args)
+    if page is None:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    mode = request.args.get("mode", "auto")
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    with stage("search"):
+        results = catalog.get().current().search(query, mode, *page)
+    with stage("json_encode"):
+        return jsonify(results)
 
 @app.route("/medicine/<name>", methods=["GET"])
 def get_medicine_details(name):
     """Return details of a selected medicine"""
-    medicine = df[df["name"].str.lower() == name.lower()]
-    if medicine.empty:
+    # Read the build before the index: a swap in between only files new
+    # details under the old build's key, which is never asked for again
+    store = catalog.get()
+    build = store.build
+    index = store.current()
+
+    def cached():
+        details = index.get(name)
+        return None if details is None else CachedResponse(details)
+
+    entry = medicine_responses.get((build, name.strip().lower()), cached)
+    if entry is None:
         return jsonify({"error": "Medicine not found"}), 404
+    return entry.response()
+
+@app.route("/medicines", methods=["POST"])
+def get_medicines_bulk():
+    """Return details for a whole list of medicine names in one round trip"""
+    names = (request.json or {}).get("names")
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        return jsonify({"error": "names must be a list of strings"}), 400
+    if len(names) > MAX_BULK:
+        return jsonify({"error": f"At most {MAX_BULK} names per request"}), 400
+    return Response(catalog.get().current().bulk(names), mimetype="application/json")
 
-    details = medicine.iloc[0].to_dict()
-    return jsonify(details)
+warmup.start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
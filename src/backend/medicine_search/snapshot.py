@@ -0,0 +1,219 @@
+"""Compile the medicine CSV into a memory-mappable binary snapshot.
+
+A snapshot directory holds one subdirectory per build plus a CURRENT file
+naming the live one, so a rebuild never touches files a running service
+has mapped. Usage, from src/backend:
+
+    python -m medicine_search.snapshot [--csv PATH] [--out DIR]
+
+Layout of a build:
+    meta.json                  row count, columns, build time
+    keys.{bin,off.npy}         sorted lowercase names
+    names.{bin,off.npy}        display names per name id
+    details.{bin,off.npy}      pre-serialized JSON per name id
+    fuzzy.{bin,off.npy}        fuzzy search texts per name id
+    grams.{bin,off.npy}        sorted n-grams, in posting list order
+    postings.npy, postings.off.npy
+
+Everything is memory-mapped and searched in place (binary search over the
+sorted keys and grams), so loading a build costs the same whatever the
+catalog size.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+FORMAT_VERSION = 2
+CURRENT = "CURRENT"
+KEEP_BUILDS = 2
+
+# Tells apart builds published by this process within the same second
+_build_numbers = itertools.count()
+
+
+class StringColumn:
+    """Read-only sequence over concatenated UTF-8 values and their offsets.
+
+    Values are sliced out of the (usually memory-mapped) blob on access;
+    `raw` returns bytes as stored, `sep` splits each value into a list.
+    """
+
+    def __init__(self, blob, offsets, raw=False, sep=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.raw = raw
+        self.sep = sep
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        value = self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+        if self.raw:
+            return value
+        value = value.decode("utf-8")
+        return value.split(self.sep) if self.sep is not None else value
+
+
+class SortedColumn(StringColumn):
+    """A StringColumn of sorted, distinct strings that can also find a value's position"""
+
+    def get(self, value, default=None):
+        """Position of `value`, or `default`: a {value: position} lookup without the dict"""
+        i = bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else default
+
+
+class PostingLists:
+    """Read-only {gram: ids} mapping over sorted grams and their concatenated posting lists"""
+
+    def __init__(self, grams, postings, offsets):
+        self.grams = grams
+        self.postings = postings
+        self.offsets = offsets
+
+    def __contains__(self, gram):
+        return self.grams.get(gram) is not None
+
+    def __getitem__(self, gram):
+        i = self.grams.get(gram)
+        if i is None:
+            raise KeyError(gram)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        return (self.grams[i] for i in range(len(self.grams)))
+
+    def __len__(self):
+        return len(self.grams)
+
+
+def write_strings(directory, name, values):
+    data = [v if isinstance(v, bytes) else v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in data], out=offsets[1:])
+    with open(os.path.join(directory, name + ".bin"), "wb") as f:
+        f.write(b"".join(data))
+    np.save(os.path.join(directory, name + ".off.npy"), offsets)
+
+
+def read_strings(directory, name, cls=StringColumn, **kwargs):
+    path = os.path.join(directory, name + ".bin")
+    # np.memmap refuses empty files
+    blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, np.uint8)
+    offsets = np.load(os.path.join(directory, name + ".off.npy"), mmap_mode="r")
+    return cls(blob, offsets, **kwargs)
+
+
+def write_build(df, directory, fuzzy_columns=("name",)):
+    """Write the catalog's prebuilt MedicineIndex to `directory`"""
+    from medicine_search.catalog import MedicineIndex
+
+    os.makedirs(directory)
+    index = MedicineIndex.from_frame(df, fuzzy_columns)
+    write_strings(directory, "keys", index.keys)
+    write_strings(directory, "names", index.names)
+    write_strings(directory, "details", index.details)
+    write_strings(directory, "fuzzy", ["\n".join(t) for t in index.fuzzy_texts])
+    grams = sorted(index.grams)
+    write_strings(directory, "grams", grams)
+    lengths = [len(index.grams[g]) for g in grams]
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    postings = np.concatenate([index.grams[g] for g in grams]) if grams else np.empty(0, np.int32)
+    np.save(os.path.join(directory, "postings.npy"), postings.astype(np.int32))
+    np.save(os.path.join(directory, "postings.off.npy"), offsets)
+
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({
+            "format": FORMAT_VERSION,
+            "rows": len(df),
+            "names": len(index),
+            "columns": list(df.columns),
+            "fuzzy_columns": list(fuzzy_columns),
+            "built_at": time.time(),
+        }, f)
+    return index
+
+
+def read_index(directory):
+    """Load a build as a MedicineIndex; large arrays stay memory-mapped"""
+    from medicine_search.catalog import MedicineIndex
+
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["format"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {meta['format']} in {directory}")
+
+    keys = read_strings(directory, "keys", cls=SortedColumn)
+    grams = PostingLists(
+        read_strings(directory, "grams", cls=SortedColumn),
+        np.load(os.path.join(directory, "postings.npy"), mmap_mode="r"),
+        np.load(os.path.join(directory, "postings.off.npy"), mmap_mode="r"),
+    )
+    return MedicineIndex(
+        keys,
+        read_strings(directory, "names"),
+        read_strings(directory, "details", raw=True),
+        read_strings(directory, "fuzzy", sep="\n"),
+        grams,
+        ids=keys,  # Binary search over the sorted keys instead of a dict
+    )
+
+
+def current_build(root):
+    """Name of the live build under `root`, or None if nothing is built yet"""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(df, root, fuzzy_columns=("name",)):
+    """Write a new build under `root` and atomically make it current"""
+    os.makedirs(root, exist_ok=True)
+    build = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_build_numbers):04d}"
+    write_build(df, os.path.join(root, build), fuzzy_columns)
+
+    tmp = os.path.join(root, CURRENT + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(build)
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+    # Older builds may still be mapped by services that haven't reloaded yet,
+    # so keep a couple around
+    builds = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+    for old in builds[:-KEEP_BUILDS]:
+        if old == build:  # Another process's build of the same second sorted after it
+            continue
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return build
+
+
+def main():
+    from medicine_search.catalog import CSV_PATH, SNAPSHOT_PATH, read_catalog_csv
+
+    parser = argparse.ArgumentParser(description="Compile the medicine catalog snapshot")
+    parser.add_argument("--csv", default=CSV_PATH, help="source CSV (default: %(default)s)")
+    parser.add_argument("--out", default=SNAPSHOT_PATH, help="snapshot directory (default: %(default)s)")
+    parser.add_argument("--fuzzy-columns", default="name",
+                        help="comma-separated columns indexed for fuzzy search")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = read_catalog_csv(args.csv)
+    build = publish(df, args.out, tuple(args.fuzzy_columns.split(",")))
+    print(f"Published {build} ({len(df)} rows) to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Request and stage latency metrics in Prometheus text format.
+
+`instrument(app)` adds per-route latency histograms and in-flight gauges to
+a Flask app and serves everything on /metrics. Handlers time their steps
+with `stage("imdecode")` blocks, which go into one histogram labelled by
+route and stage, so a slow /detect can be split into upload, decode,
+inference, categorize and JSON encoding.
+
+With METRICS_PROFILER=1 the app also gets a sampling profiler that can be
+started and stopped at runtime: POST /debug/profile/start, then
+POST /debug/profile/stop returns folded stacks for flamegraph.pl or
+speedscope. It samples every thread every PROFILE_INTERVAL_MS.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, jsonify, request
+
+PROFILER_ENABLED = os.environ.get("METRICS_PROFILER", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 10))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 300))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def label_text(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, registry, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+        self.registry.forward(self.name, labels, value)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{label_text(self.labels, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{label_text(self.labels, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{label_text(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{label_text(self.labels, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def collect(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"] + [
+            f"{self.name}{label_text(self.labels, labels)} {value}" for labels, value in values
+        ]
+
+
+class FunctionMetric:
+    """A value read when /metrics is scraped: a number, or {label value(s): number}"""
+
+    def __init__(self, name, help, fn, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        if not isinstance(value, dict):
+            return lines + [f"{self.name} {value}"]
+        for labels, v in sorted(value.items()):
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f"{self.name}{label_text(self.labels, labels)} {v}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        # Observations kept for another process to replay (see serve.py)
+        self.forwarded = None
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self, name, help, labels, buckets))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def function(self, name, help, fn, labels=(), kind="gauge"):
+        """Register (or replace) a metric computed at scrape time"""
+        metric = FunctionMetric(name, help, fn, labels, kind)
+        with self.lock:
+            self.metrics[name] = metric
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception:  # A broken callback must not take down the scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+    def start_forwarding(self):
+        with self.lock:
+            self.forwarded = []
+
+    def forward(self, name, labels, value):
+        if self.forwarded is None:  # Not a pool worker
+            return
+        # Under the lock, so an observation can't land in a list drain() has already taken
+        with self.lock:
+            if self.forwarded is not None:
+                self.forwarded.append((name, labels, value))
+
+    def drain(self):
+        """Histogram observations since the last drain, as (name, labels, value)"""
+        with self.lock:
+            observed, self.forwarded = self.forwarded, []
+        return observed
+
+    def replay(self, observed):
+        for name, labels, value in observed or ():
+            metric = self.metrics.get(name)
+            if isinstance(metric, Histogram):
+                metric.observe(value, *labels)
+
+
+REGISTRY = Registry()
+request_latency = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route", ("method", "route", "status")
+)
+stage_latency = REGISTRY.histogram(
+    "stage_duration_seconds", "Time spent in each named stage of a handler", ("route", "stage")
+)
+in_flight = REGISTRY.gauge("http_requests_in_flight", "Requests being handled, by route", ("route",))
+
+
+def route_label():
+    """The matched route pattern, never the raw path, to keep label values bounded"""
+    if not has_request_context():
+        return "background"
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - start, route_label(), name)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on a timer into folded-stack counts"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.thread = None
+        self.stopping = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval_ms=PROFILE_INTERVAL_MS, seconds=PROFILE_MAX_SECONDS):
+        """Start sampling for at most `seconds`; False if already running"""
+        with self.lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = max(1.0, interval_ms) / 1000
+            self.stopping = threading.Event()
+            deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+            self.thread = threading.Thread(
+                target=self._run, args=(self.stopping, deadline), name="sampling-profiler", daemon=True
+            )
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and return the folded stacks, one "a;b;c count" line each"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def status(self):
+        return {"running": self.running, "samples": self.samples, "interval_ms": self.interval * 1000}
+
+    def _run(self, stopping, deadline):
+        me = threading.get_ident()
+        while not stopping.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = Counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                sampled[";".join(reversed(stack))] += 1
+            with self.lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+
+profiler = SamplingProfiler()
+
+
+def metrics_response():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def instrument(app):
+    """Time every request of a Flask app and add /metrics (and the profiler routes)"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_route = route_label()
+        g.metrics_start = time.perf_counter()
+        in_flight.inc(g.metrics_route)
+
+    @app.after_request
+    def record_request_latency(response):
+        # Streamed responses are timed to their first byte
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            request_latency.observe(
+                time.perf_counter() - start, request.method, g.metrics_route, str(response.status_code)
+            )
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        route = g.pop("metrics_route", None)
+        if route is not None:
+            in_flight.dec(route)
+
+    app.add_url_rule("/metrics", "metrics", metrics_response, methods=["GET"])
+    if PROFILER_ENABLED:
+        app.add_url_rule("/debug/profile", "profile_status", profile_status, methods=["GET"])
+        app.add_url_rule("/debug/profile/start", "profile_start", profile_start, methods=["POST"])
+        app.add_url_rule("/debug/profile/stop", "profile_stop", profile_stop, methods=["POST"])
+    return app
+
+
+def profile_status():
+    return jsonify(profiler.status())
+
+
+def profile_start():
+    try:
+        interval_ms = float(request.args.get("interval_ms", PROFILE_INTERVAL_MS))
+        seconds = float(request.args.get("seconds", PROFILE_MAX_SECONDS))
+    except ValueError:
+        return jsonify({"error": "interval_ms and seconds must be numbers"}), 400
+    if not profiler.start(interval_ms, seconds):
+        return jsonify({"error": "Profiler is already running"}), 409
+    return jsonify(profiler.status()), 202
+
+
+def profile_stop():
+    return Response(profiler.stop(), mimetype="text/plain")
@@ -0,0 +1,438 @@
+"""Production entry point for the combined backend: app.py behind an ASGI server.
+
+    python serve.py                          # uvicorn on SERVE_HOST:SERVE_PORT
+    uvicorn serve:application --port 5000    # or any ASGI server
+
+Cheap routes (/symptoms, /generate-plan, symptom matching) run on the event
+loop. CPU-heavy route groups run in their own process pools, so a slow PDF
+parse only holds one worker of its group and the GIL doesn't serialize
+them. The bulk group (roster plans, batched symptom search) runs on threads
+by default, so its NDJSON responses reach the client as they are produced.
+The PDF text cache and the medicine snapshot are on disk, so they are
+shared.
+
+Pool size per group is SERVE_<GROUP>_WORKERS (0 runs the group on a thread
+instead; a pool worker sends its response back whole, a thread streams it).
+A group queues at most SERVE_QUEUE_PER_WORKER requests per worker and
+answers 503 with Retry-After beyond that.
+
+Threaded routes read the request body as the client sends it, so a roster
+upload is never held whole. Every other request body is read in full
+first (a pool worker needs it in one piece) and answered with 413 past
+SERVE_MAX_BODY_BYTES.
+
+Each pool worker warms up (see warmup.py) before taking requests, and
+/ready answers 503 until every pool has a warm worker and this process has
+warmed up too. A worker imports app.py but warms only its own group's
+subsystems; the others are never built there, as nothing routes to them.
+
+Latencies recorded inside pool workers are sent back with each response and
+replayed here, so /metrics (served by this process) covers every worker.
+"""
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HOST = os.environ.get("SERVE_HOST", "0.0.0.0")
+PORT = int(os.environ.get("SERVE_PORT", 5000))
+QUEUE_PER_WORKER = int(os.environ.get("SERVE_QUEUE_PER_WORKER", 4))
+MAX_BODY = int(os.environ.get("SERVE_MAX_BODY_BYTES", 16 * 1024 * 1024))
+
+STREAM_CHUNKS = 16  # Body chunks a streaming route may run ahead of the client
+
+# (method, path) per group; a path ending in "/" matches as a prefix
+ROUTE_GROUPS = {
+    "pdf": (("GET", "/pdf"), ("POST", "/pdf"), ("GET", "/pdf/search")),
+    "search": (("GET", "/search"), ("GET", "/medicine/"), ("POST", "/medicines")),
+    "bulk": (("POST", "/generate-plan/bulk"), ("POST", "/search/batch")),
+}
+DEFAULT_WORKERS = {"pdf": 2, "search": 2, "bulk": 0}
+GROUP_WORKERS = {
+    group: int(os.environ.get(f"SERVE_{group.upper()}_WORKERS", DEFAULT_WORKERS[group])) for group in ROUTE_GROUPS
+}
+
+_worker_app = None
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BodyStream(io.RawIOBase):
+    """wsgi.input for a threaded route: reads block until the event loop hands
+    over the next chunk of the request body (None once it has ended)"""
+
+    def __init__(self, chunks, loop):
+        self.chunks = chunks
+        self.loop = loop
+        self.buffer = b""
+        self.ended = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer and not self.ended:
+            chunk = asyncio.run_coroutine_threadsafe(self.chunks.get(), self.loop).result()
+            if chunk is None:
+                self.ended = True
+            else:
+                self.buffer = chunk
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def route_group(method, path):
+    if method == "HEAD":  # Answered by the GET route
+        method = "GET"
+    for group, routes in ROUTE_GROUPS.items():
+        for route_method, route_path in routes:
+            if method == route_method and (path == route_path or (route_path.endswith("/") and path.startswith(route_path))):
+                return group
+    return None
+
+
+def start_wsgi(wsgi_app, req):
+    """Call a WSGI app with one request dict; returns (status, headers, body iterable).
+
+    req["body"] is either the whole body as bytes or a stream read to its end.
+    """
+    environ = {
+        "REQUEST_METHOD": req["method"],
+        "SCRIPT_NAME": req["root_path"],
+        "PATH_INFO": req["path"],
+        "QUERY_STRING": req["query_string"].decode("latin-1"),
+        "SERVER_NAME": req["server"][0],
+        "SERVER_PORT": str(req["server"][1]),
+        "SERVER_PROTOCOL": f"HTTP/{req['http_version']}",
+        "REMOTE_ADDR": req["client"][0] if req["client"] else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": req["scheme"],
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if isinstance(req["body"], bytes):
+        environ["wsgi.input"] = io.BytesIO(req["body"])
+        environ["CONTENT_LENGTH"] = str(len(req["body"]))
+    else:
+        # Ends by itself, so chunked uploads can be read without a length
+        environ["wsgi.input"] = req["body"]
+        environ["wsgi.input_terminated"] = True
+    for name, value in req["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ.setdefault(name, value)
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = headers
+
+    result = wsgi_app(environ, start_response)
+    return response["status"], response["headers"], result
+
+
+def close_wsgi(result):
+    if hasattr(result, "close"):
+        result.close()
+
+
+def call_wsgi(wsgi_app, req):
+    """Run one request through a WSGI app to the end; returns (status, headers, body chunks)"""
+    status, headers, result = start_wsgi(wsgi_app, req)
+    try:
+        chunks = [chunk for chunk in result if chunk]
+    finally:
+        close_wsgi(result)
+    return status, headers, chunks
+
+
+def stream_wsgi(wsgi_app, req, loop, chunks, disconnected):
+    """Run one request on this thread, handing the response to the event loop
+    as it is produced: (status, headers), then each body chunk, then None.
+    Blocks while the queue is full, so a slow client holds back the route,
+    and stops early once the client has gone"""
+    def put(item):
+        asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+    try:
+        status, headers, result = start_wsgi(wsgi_app, req)
+    except Exception as e:
+        put(e)
+        return
+    try:
+        put((status, headers))
+        for chunk in result:
+            if disconnected.is_set():
+                break
+            if chunk:
+                put(chunk)
+    except Exception:
+        # Headers are already out; all that can be done is end the body early
+        logger.exception("Streaming %s %s failed", req["method"], req["path"])
+    finally:
+        close_wsgi(result)
+        put(None)
+
+
+def _init_worker(group):
+    global _worker_app
+    os.environ["WARMUP_GROUPS"] = group  # Read by warmup.py, which app.py imports
+    from app import app as flask_app, warmup
+
+    REGISTRY.start_forwarding()
+    # Take no requests until this worker is warm; a failed warm-up breaks the
+    # pool, which keeps /ready at 503
+    if not warmup.wait():
+        raise RuntimeError(f"{group} worker failed to warm up: {warmup.status()['steps']}")
+    _worker_app = flask_app
+
+
+def _handle(req):
+    """Run a request in a pool worker; returns call_wsgi's result and its metrics"""
+    return call_wsgi(_worker_app, req) + (REGISTRY.drain(),)
+
+
+def _ready():
+    return True
+
+
+class Application:
+    """ASGI app dispatching each request to the event loop or its group's pool"""
+
+    def __init__(self, group_workers=GROUP_WORKERS, queue_per_worker=QUEUE_PER_WORKER, max_body=MAX_BODY):
+        self.group_workers = group_workers
+        self.queue_per_worker = queue_per_worker
+        self.max_body = max_body
+        self.pools = {}
+        self.pending = {group: 0 for group in group_workers}
+        self.wsgi_app = None
+        self.pools_ready = False
+        REGISTRY.function("serve_pending_requests", "Requests queued or running per process pool",
+                          lambda: dict(self.pending), ("group",))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception("Startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for pool in self.pools.values():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        # Warm only the groups served here, not the ones the pools take
+        os.environ["WARMUP_GROUPS"] = ",".join(g for g, workers in self.group_workers.items() if workers <= 0)
+        from app import app as flask_app
+
+        self.wsgi_app = flask_app
+        loop = asyncio.get_running_loop()
+        for group, workers in self.group_workers.items():
+            if workers > 0:
+                self.pools[group] = self._pool(group)
+        # Start the workers now rather than on the first requests; they warm
+        # up in the background while /ready says 503
+        loop.create_task(self.wait_for_pools())
+
+    async def wait_for_pools(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, _ready) for group, pool in self.pools.items()
+                for _ in range(self.group_workers[group])
+            ))
+        except BrokenProcessPool:
+            logger.exception("A worker failed to warm up or died; staying unready")
+            return
+        self.pools_ready = True
+        logger.info("Process pools ready: %s", {g: self.group_workers[g] for g in self.pools})
+
+    def _pool(self, group):
+        # Workers are spawned, not forked: app.py starts background threads on import
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(self.group_workers[group], mp_context=context,
+                                   initializer=_init_worker, initargs=(group,))
+
+    async def http(self, scope, receive, send):
+        req = {
+            "method": scope["method"],
+            "root_path": scope.get("root_path", ""),
+            "path": scope["path"],
+            "query_string": scope.get("query_string", b""),
+            "headers": list(scope.get("headers", [])),
+            "server": scope.get("server") or ("localhost", PORT),
+            "client": scope.get("client"),
+            "scheme": scope.get("scheme", "http"),
+            "http_version": scope.get("http_version", "1.1"),
+        }
+        group = route_group(req["method"], req["path"])
+        if req["path"] == "/ready" and not self.pools_ready:
+            await self.respond(send, 503, [("Content-Type", "application/json")],
+                               [json.dumps({"ready": False, "pools": "starting"}).encode()])
+            return
+        if group is not None and self.pending[group] >= max(1, self.group_workers[group]) * self.queue_per_worker:
+            await self.respond(send, 503, [("Content-Type", "application/json"), ("Retry-After", "1")],
+                               [json.dumps({"error": "Server busy, retry shortly"}).encode()])
+            return
+        if group is not None and group not in self.pools:
+            self.pending[group] += 1
+            try:
+                await self.stream(receive, send, req)
+            finally:
+                self.pending[group] -= 1
+            return
+
+        try:
+            req["body"] = await self.read_body(receive)
+        except BodyTooLarge:
+            await self.respond(send, 413, [("Content-Type", "application/json")],
+                               [json.dumps({"error": f"Request body over {self.max_body} bytes"}).encode()])
+            return
+        if req["body"] is None:  # The client went away
+            return
+        if group is None:
+            await self.respond(send, *call_wsgi(self.wsgi_app, req))
+            return
+        self.pending[group] += 1
+        try:
+            await self.respond(send, *await self.call_pool(group, req))
+        finally:
+            self.pending[group] -= 1
+
+    async def read_body(self, receive):
+        """The whole request body, or None if the client disconnected first"""
+        parts = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            part = message.get("body", b"")
+            size += len(part)
+            if size > self.max_body:
+                raise BodyTooLarge()
+            parts.append(part)
+            if not message.get("more_body"):
+                return b"".join(parts)
+
+    async def call_pool(self, group, req):
+        loop = asyncio.get_running_loop()
+        pool = self.pools[group]
+        try:
+            status, headers, chunks, observed = await loop.run_in_executor(pool, _handle, req)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a parser); start a fresh pool,
+            # once, however many requests the old one failed
+            logger.exception("%s pool broke on %s %s", group, req["method"], req["path"])
+            if self.pools[group] is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pools[group] = self._pool(group)
+            return 503, [("Content-Type", "application/json"), ("Retry-After", "1")], \
+                [json.dumps({"error": "Worker restarted, retry shortly"}).encode()]
+        REGISTRY.replay(observed)
+        return status, headers, chunks
+
+    async def stream(self, receive, send, req):
+        """Run a request on a thread, feeding it the body as it arrives and
+        sending its response chunk by chunk"""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(STREAM_CHUNKS)
+        body = asyncio.Queue(STREAM_CHUNKS)
+        disconnected = threading.Event()
+        req = dict(req, body=io.BufferedReader(BodyStream(body, loop)))
+
+        async def watch():
+            reading = True
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    if reading:
+                        await body.put(None)  # A cut-off upload reads as ended
+                    return
+                if reading:
+                    await body.put(message.get("body", b""))
+                    if not message.get("more_body"):
+                        reading = False
+                        await body.put(None)
+
+        watcher = loop.create_task(watch())
+        worker = loop.run_in_executor(None, stream_wsgi, self.wsgi_app, req, loop, chunks, disconnected)
+        try:
+            first = await chunks.get()
+            if isinstance(first, Exception):
+                raise first
+            await self.respond(send, *first, None)
+            while (chunk := await chunks.get()) is not None:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            # Let the thread finish even if the client went away mid-stream,
+            # draining what it still puts so it never blocks on a full queue
+            while not worker.done():
+                getter = loop.create_task(chunks.get())
+                await asyncio.wait((getter, worker), return_when=asyncio.FIRST_COMPLETED)
+                getter.cancel()
+            watcher.cancel()
+            await worker
+
+    async def respond(self, send, status, headers, chunks):
+        """Send the response head and, unless `chunks` is None, the whole body"""
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        })
+        if chunks is None:
+            return
+        for chunk in chunks[:-1]:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": chunks[-1] if chunks else b""})
+
+
+application = Application()
+
+
+def main():
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(application, host=HOST, port=PORT, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
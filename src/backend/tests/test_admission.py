@@ -0,0 +1,176 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from flask import Flask
+from werkzeug.exceptions import BadRequest
+
+from activity.admission import (
+    DEADLINE_HEADER, DEGRADED_CONFIDENCE, DEGRADED_SIZE, AdmissionController, DeadlineExceeded, Overloaded,
+    request_deadline,
+)
+from activity.ingest import INPUT_SIZE, ImageTooLarge
+from activity.pipeline import DetectionPipeline
+from activity.result_cache import DetectionCache
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_request_deadline():
+    now = time.monotonic()
+    assert request_deadline({}, timeout_ms=1000) == pytest.approx(now + 1, abs=0.1)
+    assert request_deadline({DEADLINE_HEADER: "200"}, timeout_ms=1000) == pytest.approx(now + 0.2, abs=0.1)
+    # The client can shorten the budget, never stretch it
+    assert request_deadline({DEADLINE_HEADER: "5000"}, timeout_ms=1000) == pytest.approx(now + 1, abs=0.1)
+    assert request_deadline({DEADLINE_HEADER: "soon"}, timeout_ms=1000) == pytest.approx(now + 1, abs=0.1)
+    assert request_deadline({}, timeout_ms=0) is None
+
+
+def test_rejects_beyond_the_queue():
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+    with admission.admit():
+        with pytest.raises(Overloaded):
+            with admission.admit():
+                pass
+    with admission.admit():  # The slot is free again
+        pass
+    assert admission.stats()["rejected"] == 1
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_queued_request_gets_the_next_slot():
+    admission = AdmissionController(max_in_flight=1, max_queue=1)
+    tickets = []
+    with admission.admit():
+        waiter = threading.Thread(target=lambda: tickets.append(admission.acquire()))
+        waiter.start()
+        wait_for(lambda: admission.waiting == 1)
+        with pytest.raises(Overloaded):  # The queue holds one
+            admission.acquire()
+    waiter.join(5)
+    assert len(tickets) == 1
+    assert admission.in_flight == 1
+
+
+def test_deadline_while_queued():
+    admission = AdmissionController(max_in_flight=1, max_queue=4)
+    with admission.admit():
+        with pytest.raises(DeadlineExceeded):
+            admission.acquire(time.monotonic() + 0.05)
+    assert admission.waiting == 0
+    assert admission.in_flight == 0
+
+
+def test_acquire_without_waiting():
+    admission = AdmissionController(max_in_flight=1, max_queue=4)
+    admission.acquire(wait=False)
+    with pytest.raises(Overloaded):
+        admission.acquire(wait=False)
+    admission.release()
+    admission.acquire(wait=False)
+
+
+def test_degrades_under_pressure():
+    admission = AdmissionController(max_in_flight=4, max_queue=0, degrade=("size", "confidence"), degrade_at=0.5)
+    first = admission.acquire()
+    second = admission.acquire()
+    assert first.degraded == () and first.size == INPUT_SIZE and first.confidence is None
+    assert second.degraded == ("size", "confidence")
+    assert (second.size, second.confidence) == (DEGRADED_SIZE, DEGRADED_CONFIDENCE)
+    assert admission.stats()["degraded"] == 1
+
+    admission.disable("size", "fixed-size model")
+    third = admission.acquire()
+    assert third.degraded == ("confidence",) and third.size == INPUT_SIZE
+
+
+def test_unknown_degrade_mode():
+    with pytest.raises(ValueError):
+        AdmissionController(degrade=("colour",))
+
+
+class FakeModel:
+    def __init__(self, input_size=None):
+        if input_size:
+            self.input_size = input_size
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, images, confidence=None):
+        self.gate.wait()
+        return [[{"name": "rice", "confidence": 0.9, "box": [0, 0, 1, 1]}] for _ in images]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def test_pipeline_maps_shedding_to_status_codes(app):
+    model = FakeModel()
+    pipeline = DetectionPipeline(AdmissionController(max_in_flight=1, max_queue=0), DetectionCache(max_entries=0),
+                                 load=lambda: model)
+    frame = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), np.uint8)
+
+    assert pipeline.handle({}, lambda size: frame).status_code == 200
+
+    model.gate.clear()
+
+    def hold_slot():
+        with app.app_context():
+            pipeline.handle({}, lambda size: frame)
+
+    busy = threading.Thread(target=hold_slot)
+    busy.start()
+    wait_for(lambda: pipeline.admission.in_flight == 1)
+    body, status, headers = pipeline.handle({}, lambda size: pytest.fail("a shed request is never read"))
+    assert status == 503 and "Retry-After" in headers
+    model.gate.set()
+    busy.join(5)
+
+    expired = lambda size: time.sleep(0.05) or frame  # noqa: E731
+    body, status = pipeline.handle({DEADLINE_HEADER: "10"}, expired)
+    assert status == 504
+    assert pipeline.admission.stats()["expired"] == 1
+
+
+def test_pipeline_skips_size_degrade_for_fixed_size_models(app):
+    admission = AdmissionController(degrade=("size",))
+    pipeline = DetectionPipeline(admission, load=lambda: FakeModel(input_size=640))
+    pipeline.scheduler.get()
+    assert admission.degrade == ()
+
+
+def test_pipeline_maps_errors_to_status_codes(app, monkeypatch):
+    def broken(images, confidence=None):
+        raise RuntimeError("model exploded")
+
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+    pipeline = DetectionPipeline(admission, DetectionCache(max_entries=0), load=lambda: broken)
+    monkeypatch.setattr("activity.pipeline.logger.exception", lambda *args: None)
+    frame = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), np.uint8)
+
+    def raising(error):
+        def load_frame(size):
+            raise error
+        return load_frame
+
+    cases = [
+        (raising(ImageTooLarge("too big")), 413),
+        (raising(ValueError("Could not decode image")), 400),
+        (raising(BadRequest("No image provided")), 400),
+        (lambda size: frame, 500),
+    ]
+    for load_frame, expected in cases:
+        body, status = pipeline.handle({}, load_frame)
+        assert status == expected
+        assert "error" in body.json
+    assert admission.in_flight == 0  # Every failure gave its slot back
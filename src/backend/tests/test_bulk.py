@@ -0,0 +1,65 @@
+import io
+import json
+
+from diet_plan.bulk import roster_format, stream_plans
+from diet_plan.plans import daily_schedule, diet_paths
+
+
+def plans(text, fmt="csv", chunk_rows=2):
+    body = b"".join(stream_plans(io.BytesIO(text.encode("utf-8")), fmt, chunk_rows))
+    return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+
+ROSTER = """name,gender,height,weight,preference,allergies
+Asha,female,160,45,veg,
+Ravi,male,175,70,non-veg,peanuts; milk
+Bad,male,0,70,veg,
+Meera,female,150,80,vegan,gluten
+Nobody,male,,60,veg,
+"""
+
+
+def test_plans_follow_input_order_across_chunks():
+    rows = plans(ROSTER)
+    assert [r["row"] for r in rows] == [0, 1, 2, 3, 4]
+    assert [r.get("name") for r in rows] == ["Asha", "Ravi", None, "Meera", None]
+    assert rows[2] == {"row": 2, "error": "height and weight must be positive numbers"}
+    assert "error" in rows[4]
+
+
+def test_plan_fields_match_single_plans():
+    asha, ravi, _, meera, _ = plans(ROSTER)
+    assert (asha["bmi"], asha["category"]) == (17.58, "underweight")
+    assert asha["diet_pdf"] == diet_paths["underweight"]["veg"]
+    assert (ravi["bmi"], ravi["category"]) == (22.86, "normal")
+    assert ravi["diet_pdf"] == diet_paths["normal"]["non veg"]
+    assert ravi["allergies"] == ["peanuts", "milk"]
+    # Anything but veg / non-veg gets the allergy-friendly plan
+    assert meera["category"] == "overweight"
+    assert meera["diet_pdf"] == diet_paths["overweight"]["allergies"]
+    assert meera["exercise_pdf"] == diet_paths["overweight"]["exercise"]
+    assert asha["schedule"] == daily_schedule
+
+
+def test_ndjson_roster():
+    roster = "\n".join(json.dumps(r) for r in [
+        {"name": "Asha", "height": 160, "weight": 45, "preference": "veg", "allergies": ["nuts"]},
+        {"name": "Ravi", "height": -1, "weight": 70},
+    ])
+    asha, ravi = plans(roster, "ndjson")
+    assert asha["allergies"] == ["nuts"]
+    assert "error" in ravi
+
+
+def test_empty_and_broken_rosters():
+    assert plans("") == []
+    assert plans("name,height,weight\n") == []
+    rows = plans('{"name": "Asha", "height": 160, "weight": 45}\nnot json\n', "ndjson")
+    assert rows[-1]["error"].startswith("Could not read roster")
+
+
+def test_roster_format():
+    assert roster_format() == "csv"
+    assert roster_format(filename="people.JSONL") == "ndjson"
+    assert roster_format(content_type="application/x-ndjson") == "ndjson"
+    assert roster_format(content_type="application/x-ndjson", requested="CSV") == "csv"
@@ -0,0 +1,111 @@
+import json
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import medicine_frame
+from medicine_search.catalog import (
+    MedicineIndex, max_distance, page_args, prefix_distance, query_ngrams, word_distance,
+)
+
+
+@pytest.fixture(scope="module")
+def index():
+    df = pd.DataFrame({
+        "id": [1, 2, 3, 4, 5, 6],
+        "name": ["Dolo 650 Tablet", "Dolo 500 Tablet", "Crocin Advance Tablet", "Azithral 500 Tablet",
+                 "DOLO 650 TABLET", "Pan 40 Tablet"],
+        "price": [30.0, 25.0, 20.0, 110.0, 31.0, 150.0],
+    })
+    return MedicineIndex.from_frame(df)
+
+
+def test_prefix_is_sorted_and_case_insensitive(index):
+    assert index.prefix("dolo") == ["Dolo 500 Tablet", "Dolo 650 Tablet"]
+    assert index.prefix("  DOLO 6") == ["Dolo 650 Tablet"]
+    assert index.prefix("") == []
+    assert index.prefix("zz") == []
+
+
+def test_prefix_pages(index):
+    assert index.prefix("dolo", limit=1) == ["Dolo 500 Tablet"]
+    assert index.prefix("dolo", limit=1, offset=1) == ["Dolo 650 Tablet"]
+    assert index.prefix("dolo", offset=5) == []
+
+
+def test_fuzzy_tolerates_typos(index):
+    assert index.fuzzy("crocn")[0] == ("Crocin Advance Tablet", 1)
+    assert index.fuzzy("azitrhal")[0][0] == "Azithral 500 Tablet"
+    # Words inside the name are matched from their start too
+    assert index.fuzzy("advanse")[0] == ("Crocin Advance Tablet", 1)
+
+
+def test_fuzzy_rejects_distant_queries(index):
+    assert index.fuzzy("paracetamol") == []
+    assert index.fuzzy("   ") == []
+
+
+def test_search_modes(index):
+    assert index.search("dolo") == [{"name": "Dolo 500 Tablet"}, {"name": "Dolo 650 Tablet"}]
+    # auto only goes fuzzy when nothing starts with the query
+    assert index.search("crocn") == [{"name": "Crocin Advance Tablet", "distance": 1}]
+    assert index.search("crocn", mode="prefix") == []
+    assert index.search("dolo 650", mode="fuzzy")[0] == {"name": "Dolo 650 Tablet", "distance": 0}
+
+
+def test_get_keeps_first_duplicate(index):
+    assert json.loads(index.get(" dolo 650 tablet "))["id"] == 1
+    assert index.get("Nope") is None
+    assert len(index) == 5
+
+
+def test_bulk_keeps_request_order(index):
+    body = json.loads(index.bulk(["Pan 40 Tablet", "Nope", "dolo 500 tablet"]))
+    assert [m and m["id"] for m in body["medicines"]] == [6, None, 2]
+    assert body["missing"] == ["Nope"]
+
+
+def test_fuzzy_finds_the_best_distance():
+    # The n-gram pruning may skip candidates, but never the closest one
+    index = MedicineIndex.from_frame(medicine_frame(2000))
+    for query in ("amlo", "cefdo", "telmia", "glucip 50"):
+        limit = max_distance(query)
+        best = min(word_distance(query, t, limit) for texts in index.fuzzy_texts for t in texts)
+        found = index.fuzzy(query, limit=5)
+        assert best <= limit
+        assert found[0][1] == best
+
+
+def test_prefix_distance():
+    assert prefix_distance("dolo", "dolo 650", 1) == 0
+    assert prefix_distance("dlo", "dolo 650", 1) == 1
+    assert prefix_distance("xyz", "dolo", 1) == 2
+    assert word_distance("tablt", "dolo 650 tablet", 1) == 1
+
+
+def test_prefix_distance_matches_full_table():
+    def reference(query, text):
+        row = list(range(len(text) + 1))  # Edit distance to each prefix of `text`
+        for i, qc in enumerate(query, 1):
+            prev, row = row, [i]
+            for j, tc in enumerate(text, 1):
+                row.append(min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (qc != tc)))
+        return min(row)
+
+    rng = random.Random(0)
+    for _ in range(5000):
+        query = "".join(rng.choice("abc ") for _ in range(rng.randint(1, 10)))
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 14)))
+        max_dist = rng.randint(1, 3)
+        assert prefix_distance(query, text, max_dist) == min(reference(query, text), max_dist + 1)
+
+
+def test_query_ngrams_pad_the_front():
+    assert query_ngrams("ab") == {"  a", " ab"}
+
+
+def test_page_args():
+    assert page_args({}) == (20, 0)
+    assert page_args({"limit": "1000", "offset": "-3"}) == (100, 0)
+    assert page_args({"limit": "x"}) is None
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from disease_overview.fulltext import FullTextIndex, tokenize
+
+
+class FakeTexts:
+    """Stands in for PdfTextCache: each 'PDF' is plain text, pages split on form feeds"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def pages(self, path):
+        self.calls += 1
+        with open(path, encoding="utf-8") as f:
+            return f.read().split("\f")
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    pdf_dir = tmp_path / "PDF"
+    pdf_dir.mkdir()
+    (pdf_dir / "Flu.pdf").write_text("Influenza causes fever and cough.\fRest and fluids help with fever.")
+    (pdf_dir / "Diabetes.pdf").write_text("Diabetes raises blood sugar. Insulin lowers blood sugar.")
+    (pdf_dir / "Cold.pdf").write_text("A cold causes a runny nose and a mild cough.")
+    return pdf_dir
+
+
+def index_for(pdf_dir, texts=None):
+    index = FullTextIndex(texts or FakeTexts(), pdf_dir=str(pdf_dir), index_path=str(pdf_dir.parent / "ft.json"))
+    index.refresh()
+    return index
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("The flu is a Virus, x 2 H1N1") == ["flu", "virus", "h1n1"]
+
+
+def test_ranks_by_bm25(corpus):
+    index = index_for(corpus)
+    assert [r["document"] for r in index.search("fever")] == ["Flu"]
+    # Two hits of a term beat one in a document of similar length
+    assert [r["document"] for r in index.search("cough fever")] == ["Flu", "Cold"]
+    assert [r["document"] for r in index.search("blood sugar insulin")] == ["Diabetes"]
+    assert index.search("the and") == []
+    assert index.search("cough", limit=1)[0]["document"] in ("Flu", "Cold")
+
+
+def test_snippet_highlights(corpus):
+    result = index_for(corpus).search("insulin")[0]
+    start, end = result["highlights"][0]
+    assert result["snippet"][start:end].lower() == "insulin"
+
+
+def test_refresh_only_retokenizes_changed_files(corpus):
+    texts = FakeTexts()
+    index_for(corpus, texts)
+    assert texts.calls == 3
+
+    # A restart loads the persisted frequencies
+    texts = FakeTexts()
+    index = index_for(corpus, texts)
+    assert texts.calls == 0
+
+    (corpus / "Cold.pdf").write_text("A cold brings sneezing.")
+    os.utime(corpus / "Cold.pdf", ns=(0, 10**9))
+    os.remove(corpus / "Diabetes.pdf")
+    index.refresh()
+    assert texts.calls == 1
+    assert [r["document"] for r in index.search("sneezing")] == ["Cold"]
+    assert index.search("insulin") == []
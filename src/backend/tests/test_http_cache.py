@@ -0,0 +1,84 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from http_cache import CachedResponse, ResponseCache, etag_matches
+
+ETAG = '"abc"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, ETAG) is expected
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    small = CachedResponse.json({"ok": True})
+    large = CachedResponse.json({"items": ["x" * 40] * 100})
+
+    @app.route("/small", methods=["GET", "HEAD", "POST"])
+    def small_route():
+        return small.response()
+
+    @app.route("/large")
+    def large_route():
+        return large.response(max_age=60)
+
+    return app.test_client()
+
+
+def test_conditional_get(client):
+    first = client.get("/small")
+    assert first.status_code == 200
+    assert first.json == {"ok": True}
+    assert first.headers["Cache-Control"] == "public, max-age=300"
+
+    etag = first.headers["ETag"]
+    assert client.get("/small", headers={"If-None-Match": etag}).status_code == 304
+    assert client.head("/small", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/small", headers={"If-None-Match": '"stale"'}).status_code == 200
+    # Conditional GET only; other methods always get the body
+    assert client.post("/small", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_encoding_negotiation(client):
+    plain = client.get("/large")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Cache-Control"] == "public, max-age=60"
+
+    zipped = client.get("/large", headers={"Accept-Encoding": "gzip, deflate"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers["ETag"] == plain.headers["ETag"]
+
+    refused = client.get("/large", headers={"Accept-Encoding": "gzip;q=0, br;q=0"})
+    assert "Content-Encoding" not in refused.headers
+    # Small bodies aren't worth compressing
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_response_cache_is_an_lru():
+    cache = ResponseCache(max_entries=2)
+    built = []
+
+    def build(key):
+        built.append(key)
+        return CachedResponse.json({"key": key})
+
+    for key in ("a", "b", "a", "c", "a", "b"):
+        cache.get(key, lambda: build(key))
+    assert built == ["a", "b", "c", "b"]
+    assert cache.get("none", lambda: None) is None
+    assert "none" not in cache.entries
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from activity.admission import DeadlineExceeded, Overloaded
+from activity.inference import BatchScheduler
+
+
+def frame(value, size=8):
+    return np.full((size, size, 3), value, np.uint8)
+
+
+class FakeModel:
+    """Records each batched call; a frame of value 255 breaks whatever batch it is in.
+
+    While `gate` is clear, calls block once they have started (`busy` is set).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.busy = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, images, confidence=None):
+        self.busy.set()
+        self.gate.wait()
+        self.calls.append(([int(img[0, 0, 0]) for img in images], confidence))
+        if any(img[0, 0, 0] == 255 for img in images):
+            raise RuntimeError("bad frame")
+        return [[{"name": "rice", "confidence": 0.9, "value": int(img[0, 0, 0])}] for img in images]
+
+
+def test_concurrent_frames_share_a_call():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=4, max_wait_ms=50)
+    first = scheduler.submit(frame(0))
+    model.busy.wait(5)  # The worker holds frame 0 in a call of its own
+    futures = [scheduler.submit(frame(i)) for i in range(1, 6)]
+    model.gate.set()
+    assert [f.result(5)[0]["value"] for f in [first] + futures] == [0, 1, 2, 3, 4, 5]
+    assert [values for values, _ in model.calls] == [[0], [1, 2, 3, 4], [5]]
+    assert scheduler.stats()["batch_sizes"] == {"1": 2, "4": 1}
+
+
+def test_sizes_and_cutoffs_run_separately():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=8, max_wait_ms=50)
+    scheduler.submit(frame(0))
+    model.busy.wait(5)
+    futures = [
+        scheduler.submit(frame(1)),
+        scheduler.submit(frame(2, size=4)),
+        scheduler.submit(frame(3), confidence=0.5),
+        scheduler.submit(frame(4)),
+    ]
+    model.gate.set()
+    for f in futures:
+        f.result(5)
+    assert sorted(model.calls[1:]) == [([1, 4], None), ([2], None), ([3], 0.5)]
+
+
+def test_failed_batch_retries_frames_one_by_one():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=4, max_wait_ms=50)
+    scheduler.submit(frame(0))
+    model.busy.wait(5)
+    good, bad, other = scheduler.submit(frame(1)), scheduler.submit(frame(255)), scheduler.submit(frame(2))
+    model.gate.set()
+    assert good.result(5)[0]["value"] == 1
+    assert other.result(5)[0]["value"] == 2
+    with pytest.raises(RuntimeError):
+        bad.result(5)
+
+
+def test_short_results_fail_instead_of_hanging():
+    def predict(images, confidence=None):
+        return [[] for _ in images[:-1]]  # One result short
+
+    scheduler = BatchScheduler(predict, max_batch=4, max_wait_ms=50)
+    futures = [scheduler.submit(frame(i)) for i in range(3)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="results for"):
+            f.result(5)
+
+
+def test_detect_waits_no_longer_than_the_deadline():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=4, max_wait_ms=0)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        scheduler.detect(frame(0), deadline=start + 0.1)
+    assert time.monotonic() - start < 1
+    model.gate.set()
+
+
+def test_expired_frames_are_dropped_unrun():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=4, max_wait_ms=0)
+    scheduler.submit(frame(0))
+    model.busy.wait(5)
+    late = scheduler.submit(frame(1), deadline=time.monotonic() + 0.01)
+    time.sleep(0.05)
+    model.gate.set()
+    with pytest.raises(DeadlineExceeded):
+        late.result(5)
+    assert [values for values, _ in model.calls] == [[0]]
+    assert scheduler.stats()["expired"] == 1
+
+
+def test_full_queue_is_overloaded():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch=2, max_wait_ms=0, max_pending=3)
+    scheduler.submit(frame(0))
+    model.busy.wait(5)
+    queued = [scheduler.submit(frame(i)) for i in range(1, 4)]
+    assert scheduler.backlog() == 1.5
+    with pytest.raises(Overloaded):
+        scheduler.submit(frame(4))
+    model.gate.set()
+    for f in queued:
+        f.result(5)
+
+
+def test_warm_up_is_left_out_of_stats():
+    model = FakeModel()
+    scheduler = BatchScheduler(model, max_batch=3, max_wait_ms=50)
+    scheduler.warm_up(16)
+    assert [len(values) for values, _ in model.calls] == [3, 1]
+    stats = scheduler.stats()
+    assert stats["batches"] == 0 and stats["images"] == 0 and stats["max_queue_depth"] == 0
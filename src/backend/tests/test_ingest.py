@@ -0,0 +1,102 @@
+import base64
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from activity import ingest
+from activity.ingest import ImageTooLarge, decode_image, image_size, letterbox, load_base64, load_upload
+
+
+def encode(width, height, ext=".jpg"):
+    img = np.zeros((height, width, 3), np.uint8)
+    img[:, : width // 2] = (0, 0, 255)
+    ok, buf = cv2.imencode(ext, img)
+    assert ok
+    return buf.reshape(-1)
+
+
+def png_header(width, height):
+    return np.frombuffer(
+        b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + width.to_bytes(4, "big") + height.to_bytes(4, "big")
+        + b"\x08\x02\x00\x00\x00", np.uint8)
+
+
+def jpeg_header(width, height):
+    # SOI, an APP0 segment to skip, then SOF0 with the frame size
+    app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof0 = b"\xff\xc0\x00\x11\x08" + height.to_bytes(2, "big") + width.to_bytes(2, "big") + b"\x03" + b"\x00" * 9
+    return np.frombuffer(b"\xff\xd8" + app0 + sof0, np.uint8)
+
+
+def test_image_size_from_headers():
+    assert image_size(encode(300, 200)) == (300, 200)
+    assert image_size(encode(300, 200, ".png")) == (300, 200)
+    assert image_size(jpeg_header(4000, 3000)) == (4000, 3000)
+    assert image_size(png_header(10, 20)) == (10, 20)
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\xff\xd8",  # SOI and nothing else
+    b"\xff\xd8\xff\xe0\x00",  # Cut off inside a segment
+    b"\xff\xd8\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00",  # Not a marker where one should be
+    b"\x89PNG\r\n\x1a\n\x00\x00",  # PNG signature without IHDR
+    b"GIF89a" + b"\x00" * 20,
+])
+def test_image_size_of_truncated_or_other_data(data):
+    assert image_size(np.frombuffer(data, np.uint8)) is None
+
+
+def test_corrupt_image_is_a_value_error():
+    with pytest.raises(ValueError, match="Could not decode"):
+        decode_image(jpeg_header(100, 100))
+    with pytest.raises(ValueError):
+        decode_image(np.frombuffer(b"not an image", np.uint8))
+
+
+def test_oversized_dimensions_are_refused_before_decoding(monkeypatch):
+    monkeypatch.setattr(ingest.cv2, "imdecode", lambda *args: pytest.fail("decoded anyway"))
+    for header in (jpeg_header(10000, 10000), png_header(60000, 60000)):
+        with pytest.raises(ImageTooLarge):
+            decode_image(header)
+
+
+def test_oversized_uploads(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_UPLOAD_BYTES", 100)
+    with pytest.raises(ImageTooLarge):
+        load_upload(io.BufferedReader(io.BytesIO(b"x" * 200)))
+    with pytest.raises(ImageTooLarge):
+        load_base64(base64.b64encode(b"x" * 200).decode())
+
+
+def test_large_jpegs_decode_reduced(monkeypatch):
+    flags = []
+    imdecode = cv2.imdecode
+    monkeypatch.setattr(ingest.cv2, "imdecode", lambda buf, flag: flags.append(flag) or imdecode(buf, flag))
+    assert decode_image(encode(2600, 1300), size=640).shape == (640, 640, 3)
+    assert decode_image(encode(1000, 800), size=640).shape == (640, 640, 3)
+    # 2600 / 4 still covers 640; 1000 / 2 would not
+    assert flags == [cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_COLOR]
+
+
+def test_upload_and_base64_decode_the_same():
+    buf = encode(320, 240)
+    from_upload = load_upload(io.BytesIO(buf.tobytes()), size=160)
+    from_base64 = load_base64("data:image/jpeg;base64," + base64.b64encode(buf.tobytes()).decode(), size=160)
+    assert np.array_equal(from_upload, from_base64)
+
+
+@pytest.mark.parametrize("shape, content", [
+    ((100, 200), (slice(25, 75), slice(0, 100))),   # Wide: padded top and bottom
+    ((200, 100), (slice(0, 100), slice(25, 75))),   # Tall: padded left and right
+    ((50, 50), (slice(0, 100), slice(0, 100))),     # Square: scaled up, no padding
+])
+def test_letterbox_geometry(shape, content):
+    out = letterbox(np.full(shape + (3,), 255, np.uint8), size=100)
+    assert out.shape == (100, 100, 3)
+    assert (out[content] == 255).all()
+    mask = np.ones((100, 100), bool)
+    mask[content] = False
+    assert (out[mask] == 114).all()
@@ -0,0 +1,135 @@
+import re
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import metrics
+from metrics import REGISTRY, CONTENT_TYPE, Registry, instrument, stage
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/items/<name>")
+    def item(name):
+        with stage("lookup"):
+            time.sleep(0.002)
+        return {"name": name}
+
+    return instrument(app)
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line of an exposition"""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            out[key] = float(value)
+    return out
+
+
+def test_exposition_after_a_request():
+    client = make_app().test_client()
+    before = samples(client.get("/metrics").text)
+    assert client.get("/items/dolo").status_code == 200
+    response = client.get("/metrics")
+    assert response.content_type == CONTENT_TYPE
+    after = samples(response.text)
+
+    # Labelled by the route pattern, not the raw path
+    count = 'http_request_duration_seconds_count{method="GET",route="/items/<name>",status="200"}'
+    assert after[count] == before.get(count, 0) + 1
+    assert not any("/items/dolo" in key for key in after)
+
+    lookup = 'stage_duration_seconds_count{route="/items/<name>",stage="lookup"}'
+    assert after[lookup] == before.get(lookup, 0) + 1
+    # Buckets are cumulative and end in +Inf == count
+    buckets = [v for k, v in after.items()
+               if k.startswith('stage_duration_seconds_bucket{route="/items/<name>",stage="lookup"')]
+    assert buckets == sorted(buckets) and buckets[-1] == after[lookup]
+    assert after['http_requests_in_flight{route="/items/<name>"}'] == 0
+
+    text = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert re.search(r'le="0.005"', text)
+
+
+def test_replays_samples_forwarded_from_a_pool_worker():
+    client = make_app().test_client()
+    key = 'stage_duration_seconds_count{route="/pdf",stage="extract"}'
+    before = samples(client.get("/metrics").text).get(key, 0)
+
+    # What a pool worker does (see serve.py): record, then drain with its response
+    worker = Registry()
+    histogram = worker.histogram("stage_duration_seconds", "", ("route", "stage"))
+    histogram.observe(0.5, "/pdf", "extract")  # Before forwarding starts: kept local only
+    worker.start_forwarding()
+    histogram.observe(0.003, "/pdf", "extract")
+    histogram.observe(0.004, "/pdf", "extract")
+    observed = worker.drain()
+    assert observed == [("stage_duration_seconds", ("/pdf", "extract"), 0.003),
+                        ("stage_duration_seconds", ("/pdf", "extract"), 0.004)]
+    assert worker.drain() == []
+
+    REGISTRY.replay(observed)
+    after = samples(client.get("/metrics").text)
+    assert after[key] == before + 2
+
+
+def test_forwarding_loses_nothing_under_concurrency():
+    worker = Registry()
+    histogram = worker.histogram("h", "", ("n",))
+    worker.start_forwarding()
+    drained = []
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            drained.extend(worker.drain())
+
+    drainer = threading.Thread(target=drain)
+    drainer.start()
+    threads = [threading.Thread(target=lambda: [histogram.observe(0.001, "x") for _ in range(2000)])
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stop.set()
+    drainer.join()
+    drained.extend(worker.drain())
+    assert len(drained) == 8000
+
+
+def test_function_metrics_and_broken_callbacks():
+    registry = Registry()
+    registry.function("queue_depth", "Frames waiting", lambda: 3)
+    registry.function("shed_total", "Shed requests", lambda: {"overloaded": 2, "deadline": 1}, ("reason",),
+                      kind="counter")
+    registry.function("broken", "Raises", lambda: 1 / 0)
+    text = registry.render()
+    assert "queue_depth 3" in text
+    assert 'shed_total{reason="deadline"} 1' in text
+    assert "# TYPE shed_total counter" in text
+    assert "broken" not in text
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_profiler_routes_only_when_enabled(monkeypatch, enabled):
+    monkeypatch.setattr(metrics, "PROFILER_ENABLED", enabled)
+    client = make_app().test_client()
+    status = client.get("/debug/profile").status_code
+    if not enabled:
+        assert status == 404
+        assert client.post("/debug/profile/start").status_code == 404
+        return
+    assert status == 200
+    assert client.post("/debug/profile/start?interval_ms=1&seconds=5").status_code == 202
+    assert client.post("/debug/profile/start").status_code == 409
+    time.sleep(0.05)
+    folded = client.post("/debug/profile/stop").text
+    assert folded and all(re.fullmatch(r".+ \d+", line) for line in folded.splitlines())
+    assert client.post("/debug/profile/start?interval_ms=x").status_code == 400
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from disease_overview import pdf_cache
+from disease_overview.pdf_cache import PdfTextCache, page_span
+
+
+@pytest.mark.parametrize("data, expected", [
+    ({}, (1, 5)),
+    ({"page": 3}, (3, 3)),
+    ({"page": "2"}, (2, 2)),
+    ({"start_page": 2}, (2, 5)),
+    ({"end_page": 2}, (1, 2)),
+    ({"start_page": 2, "end_page": 99}, (2, 5)),
+    ({"start_page": None, "end_page": None}, (1, 5)),
+    ({"page": 0}, None),
+    ({"page": 6}, None),
+    ({"start_page": 0}, None),
+    ({"end_page": 0}, None),
+    ({"start_page": 4, "end_page": 2}, None),
+    ({"page": "x"}, None),
+    ({"start_page": [1]}, None),
+])
+def test_page_span(data, expected):
+    assert page_span(data, 5) == expected
+
+
+def test_page_span_of_empty_document():
+    assert page_span({}, 0) == (1, 0)
+    assert page_span({"page": 1}, 0) is None
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        with open(path, encoding="utf-8") as f:
+            return f.read().split("\f")
+
+    monkeypatch.setattr(pdf_cache, "extract_pages", extract)
+    return calls
+
+
+def test_extracts_once_per_version(tmp_path, extracted):
+    doc = tmp_path / "doc.pdf"
+    doc.write_text("one\ftwo", encoding="utf-8")
+    cache = PdfTextCache(cache_dir=str(tmp_path / "cache"))
+    assert cache.pages(str(doc)) == ["one", "two"]
+    assert cache.pages(str(doc)) == ["one", "two"]
+    assert len(extracted) == 1
+
+    # A fresh process finds the text on disk
+    assert PdfTextCache(cache_dir=str(tmp_path / "cache")).pages(str(doc)) == ["one", "two"]
+    assert len(extracted) == 1
+
+    doc.write_text("one\ftwo\fthree", encoding="utf-8")
+    os.utime(doc, ns=(0, 10**9))
+    assert cache.pages(str(doc)) == ["one", "two", "three"]
+    assert len(extracted) == 2
+
+
+def test_memory_is_bounded(tmp_path, extracted):
+    cache = PdfTextCache(cache_dir=str(tmp_path / "cache"), max_entries=2)
+    paths = []
+    for name in "abc":
+        path = tmp_path / f"{name}.pdf"
+        path.write_text(name, encoding="utf-8")
+        paths.append(str(path))
+        cache.pages(str(path))
+    assert list(cache.memory) == paths[1:]
+
+
+def test_resolve_pdf_falls_back_to_pdf_dir():
+    assert pdf_cache.resolve_pdf("C:\\Users\\someone\\Flu.pdf") == os.path.join(pdf_cache.PDF_DIR, "Flu.pdf")
@@ -0,0 +1,57 @@
+import time
+
+import cv2
+import numpy as np
+
+from activity.result_cache import DetectionCache, dhash
+
+
+def test_dhash_tolerates_small_changes():
+    rng = np.random.default_rng(0)
+    img = cv2.resize(rng.integers(0, 256, (9, 8, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR)
+    noisy = np.clip(img.astype(int) + rng.integers(-3, 4, img.shape), 0, 255).astype(np.uint8)
+    other = img[:, ::-1].copy()
+    assert (dhash(img) ^ dhash(noisy)).bit_count() <= 6
+    assert (dhash(img) ^ dhash(other)).bit_count() > 6
+    assert dhash(img) == dhash(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+def test_nearest_entry_within_distance():
+    cache = DetectionCache(max_entries=8, ttl=60, max_distance=2)
+    cache.put(0b0000, "zero")
+    cache.put(0b1111, "ones")
+    assert cache.get(0b0001) == "zero"
+    assert cache.get(0b0111) == "ones"
+    assert cache.get(0b0011) == "zero"  # Equally close: the tie goes to the least recently used
+    assert cache.get(0b111 << 20) is None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = DetectionCache(max_entries=2, ttl=60, max_distance=0)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"  # Now 2 is the least recently used
+    cache.put(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+
+
+def test_entries_expire():
+    cache = DetectionCache(max_entries=4, ttl=0.05, max_distance=0)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    cache.get(1)  # A hit doesn't extend the entry's life
+    time.sleep(0.1)
+    cache.put(3, "c")
+    assert cache.get(1) is None
+    assert cache.get(3) == "c"
+    assert cache.stats()["entries"] == 1
+
+
+def test_disabled_cache():
+    cache = DetectionCache(max_entries=0)
+    cache.put(1, "a")
+    assert cache.get(1) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from flask import Flask, Response, request, stream_with_context
+
+import serve
+from serve import Application, route_group
+
+
+def make_app():
+    app = Flask(__name__)
+    app.state = {"started": threading.Event(), "release": threading.Event()}
+    app.state["release"].set()
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return {"length": len(request.get_data()), "type": request.content_type}
+
+    @app.route("/search/batch", methods=["POST"])
+    def lines():
+        @stream_with_context
+        def generate():
+            app.state["started"].set()
+            for line in request.stream:
+                app.state["release"].wait(5)
+                yield line.upper()
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    return app
+
+
+def http_scope(method, path, headers=()):
+    return {"type": "http", "method": method, "path": path, "query_string": b"",
+            "headers": [(k.encode(), v.encode()) for k, v in headers]}
+
+
+async def call(app, method, path, parts=(b"",), headers=(), disconnect=None):
+    """Send `parts` as the request body; returns (status, body, response messages)"""
+    messages = [{"type": "http.request", "body": p, "more_body": i < len(parts) - 1} for i, p in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await (disconnect or asyncio.Event()).wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(http_scope(method, path, headers), receive, send)
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return sent[0]["status"], body, sent
+
+
+@pytest.fixture
+def application():
+    app = Application({"pdf": 1, "search": 1, "bulk": 0}, queue_per_worker=2, max_body=1024)
+    app.wsgi_app = make_app()
+    app.pools_ready = True
+    return app
+
+
+def test_route_groups():
+    assert route_group("GET", "/pdf") == "pdf"
+    assert route_group("HEAD", "/pdf") == "pdf"
+    assert route_group("GET", "/medicine/Dolo 650") == "search"
+    assert route_group("POST", "/generate-plan/bulk") == "bulk"
+    assert route_group("POST", "/search") is None
+    assert route_group("GET", "/symptoms") is None
+
+
+def test_streamed_requests_release_their_slot(application):
+    async def run():
+        statuses = []
+        for _ in range(3 * application.queue_per_worker):
+            status, body, _ = await asyncio.wait_for(call(application, "POST", "/search/batch", [b"a\n"]), 2)
+            statuses.append(status)
+            assert body == b"A\n"
+        return statuses
+
+    assert asyncio.run(run()) == [200] * 6
+    assert application.pending["bulk"] == 0
+
+
+def test_streamed_body_is_read_as_it_arrives(application):
+    async def run():
+        parts = [b'{"n": %d}\n' % i for i in range(50)]
+        status, body, sent = await call(application, "POST", "/search/batch", parts)
+        return status, body, sent
+
+    status, body, sent = asyncio.run(run())
+    assert status == 200
+    assert body.count(b"\n") == 50
+    # One body message per line: the response went out as it was produced
+    assert len([m for m in sent if m["type"] == "http.response.body"]) > 2
+
+
+def test_queue_cap(application):
+    application.wsgi_app.state["release"].clear()
+
+    async def run():
+        busy = [asyncio.create_task(call(application, "POST", "/search/batch", [b"a\n"])) for _ in range(2)]
+        while application.pending["bulk"] < 2:
+            await asyncio.sleep(0.01)
+        status, body, sent = await call(application, "POST", "/search/batch", [b"a\n"])
+        application.wsgi_app.state["release"].set()
+        done = await asyncio.gather(*busy)
+        return status, dict(sent[0]["headers"]), [s for s, _, _ in done]
+
+    status, headers, others = asyncio.run(run())
+    assert status == 503 and headers[b"retry-after"] == b"1"
+    assert others == [200, 200]
+
+
+def test_disconnect_stops_the_stream(application):
+    state = application.wsgi_app.state
+    state["release"].clear()
+
+    async def run():
+        gone = asyncio.Event()
+        task = asyncio.create_task(call(application, "POST", "/search/batch", [b"a\n" * 100], disconnect=gone))
+        await asyncio.get_running_loop().run_in_executor(None, state["started"].wait, 5)
+        gone.set()
+        state["release"].set()
+        status, body, _ = await asyncio.wait_for(task, 5)
+        return status, body
+
+    status, body = asyncio.run(run())
+    assert status == 200
+    assert body.count(b"\n") < 100
+    assert application.pending["bulk"] == 0
+
+
+def test_loop_routes_get_the_whole_body(application):
+    status, body, _ = asyncio.run(call(application, "POST", "/echo", [b"ab", b"cd"],
+                                       headers=[("Content-Type", "text/plain")]))
+    assert status == 200
+    assert json.loads(body) == {"length": 4, "type": "text/plain"}
+
+
+def test_oversized_body(application):
+    status, body, _ = asyncio.run(call(application, "POST", "/echo", [b"x" * 1000, b"x" * 1000]))
+    assert status == 413
+
+
+def test_not_ready_until_pools_are(application):
+    application.pools_ready = False
+    status, body, _ = asyncio.run(call(application, "GET", "/ready"))
+    assert status == 503 and json.loads(body)["ready"] is False
+
+
+class BrokenPool:
+    """Fails every request already sent to it, as a pool whose worker died does"""
+
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_once(application, monkeypatch):
+    broken = BrokenPool()
+    application.pools["search"] = broken
+    replacements = []
+    monkeypatch.setattr(application, "_pool", lambda group: replacements.append(group) or object())
+    monkeypatch.setattr(serve.logger, "exception", lambda *args: None)
+
+    async def run():
+        return await asyncio.gather(*(call(application, "GET", "/search") for _ in range(2)))
+
+    assert [status for status, _, _ in asyncio.run(run())] == [503, 503]
+    assert replacements == ["search"]
+    assert broken.shut_down
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+import pytest
+
+from benchmarks.fixtures import medicine_frame
+from medicine_search import snapshot
+from medicine_search.catalog import CatalogStore, MedicineIndex
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return medicine_frame(500)
+
+
+def test_read_index_matches_in_memory_index(frame, tmp_path):
+    build = snapshot.publish(frame, str(tmp_path))
+    loaded = snapshot.read_index(os.path.join(tmp_path, build))
+    built = MedicineIndex.from_frame(frame)
+
+    assert len(loaded) == len(built)
+    assert list(loaded.keys) == built.keys
+    for query in ("am", "cef", "telmia", "glucip 50", "zz"):
+        assert loaded.search(query) == built.search(query)
+        assert loaded.search(query, mode="fuzzy") == built.search(query, mode="fuzzy")
+    names = built.names[:5] + ["Nope"]
+    assert loaded.bulk(names) == built.bulk(names)
+
+
+def test_posting_lists(frame, tmp_path):
+    build = snapshot.publish(frame, str(tmp_path))
+    grams = snapshot.read_index(os.path.join(tmp_path, build)).grams
+    built = MedicineIndex.from_frame(frame).grams
+    assert sorted(built) == list(grams)
+    assert "  a" in grams and "\x00\x00\x00" not in grams
+    assert grams["  a"].tolist() == built["  a"].tolist()
+    with pytest.raises(KeyError):
+        grams["\x00\x00\x00"]
+
+
+def test_old_format_is_refused(frame, tmp_path):
+    build = snapshot.publish(frame, str(tmp_path))
+    meta_path = os.path.join(tmp_path, build, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["format"] = 1
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        snapshot.read_index(os.path.join(tmp_path, build))
+
+
+def test_publish_keeps_recent_builds(frame, tmp_path):
+    # Several builds within one second each get their own directory
+    builds = [snapshot.publish(frame, str(tmp_path)) for _ in range(3)]
+    assert len(set(builds)) == 3
+    assert snapshot.current_build(str(tmp_path)) == builds[-1]
+    assert sorted(d for d in os.listdir(tmp_path) if os.path.isdir(tmp_path / d)) == builds[1:]
+    assert not any(name.startswith("col.") for name in os.listdir(tmp_path / builds[-1]))
+
+
+def test_store_swaps_in_new_builds(frame, tmp_path):
+    root = str(tmp_path)
+    snapshot.publish(frame.iloc[:100], root)
+    store = CatalogStore(snapshot_path=root, csv_path=None, reload_interval=0)
+    old = store.current()
+    assert len(old) == len(MedicineIndex.from_frame(frame.iloc[:100]))
+
+    build = snapshot.publish(frame, root)
+    deadline = time.monotonic() + 5
+    while store.current() is old and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.build == build
+    assert len(store.current()) == len(MedicineIndex.from_frame(frame))
+    # Requests holding the old index keep a working one
+    assert old.get(old.names[0]) is not None
+
+
+def test_store_falls_back_to_csv(frame, tmp_path):
+    csv_path = tmp_path / "catalog.csv"
+    frame.to_csv(csv_path, index=False)
+    store = CatalogStore(snapshot_path=str(tmp_path / "missing"), csv_path=str(csv_path), reload_interval=60)
+    assert store.build is None
+    assert len(store.current()) == len(MedicineIndex.from_frame(frame))
@@ -0,0 +1,151 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from activity.admission import DEGRADED_SIZE, AdmissionController
+from activity.categories import categorize
+from activity.stream import MOTION_SIZE, StreamSession, iou
+
+SIZE = 320
+
+
+class FakeScheduler:
+    """Hands out futures the test resolves by hand"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, image, deadline=None, confidence=None):
+        future = Future()
+        self.submitted.append((image.shape[0], confidence, future))
+        return future
+
+    def backlog(self):
+        return 0
+
+    def finish(self, detections):
+        self.submitted[-1][2].set_result(detections)
+
+
+def scene(dx=0, dy=0, size=SIZE):
+    """A textured frame whose content is moved by (dx, dy) pixels at `size`"""
+    rng = np.random.default_rng(0)
+    texture = rng.integers(0, 256, (64, 64), np.uint8)
+    big = np.kron(texture, np.ones((10, 10), np.uint8))  # 640 x 640
+    shift = np.roll(big, (dy * 2, dx * 2), axis=(0, 1))[::2, ::2]  # 320 x 320, moved by (dx, dy)
+    if size != SIZE:
+        import cv2
+        shift = cv2.resize(shift, (size, size), interpolation=cv2.INTER_AREA)
+    return np.repeat(shift[:, :, None], 3, axis=2)
+
+
+class Decoder:
+    """decode(message, size) for messages that are (dx, dy) shifts of one scene"""
+
+    def __init__(self):
+        self.sizes = []
+
+    def __call__(self, message, size):
+        self.sizes.append(size)
+        return scene(*message, size=size)
+
+
+def banana(box, confidence=0.9):
+    return {"name": "banana", "confidence": confidence, "box": box}
+
+
+def session(**kwargs):
+    scheduler = FakeScheduler()
+    return StreamSession(scheduler, categorize, min_interval_ms=0, size=SIZE, **kwargs), scheduler
+
+
+def test_iou():
+    assert iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1
+    assert iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0
+    assert iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(1 / 3)
+
+
+def test_detector_frames_are_decoded_once():
+    stream, scheduler = session()
+    decode = Decoder()
+    stream.push((0, 0), decode)
+    assert decode.sizes == [SIZE]
+    assert len(scheduler.submitted) == 1
+
+
+def test_skipped_frames_are_decoded_small_or_not_at_all():
+    stream, scheduler = session()
+    stream.min_interval = 60
+    decode = Decoder()
+    stream.push((0, 0), decode)
+    stream.push((0, 0), decode)  # Inference still pending: only motion
+    assert decode.sizes == [SIZE, MOTION_SIZE]
+
+    scheduler.finish([])
+    stream.push((0, 0), decode)  # Nothing tracked, nothing due: not decoded
+    assert decode.sizes == [SIZE, MOTION_SIZE]
+    assert len(scheduler.submitted) == 1
+
+
+def test_messages_only_on_change():
+    stream, scheduler = session()
+    stream.min_interval = 60
+    decode = Decoder()
+    assert stream.push((0, 0), decode) is not None  # The first (empty) payload
+    assert stream.poll() is None
+    scheduler.finish([banana([10, 10, 50, 50])])
+    update = stream.poll()
+    assert update["vitamin_b"]["details"] == [{"item": "banana", "confidence": 0.9}]
+    assert stream.poll() is None
+    assert stream.push((0, 0), decode) is None
+
+
+def test_tracks_follow_camera_motion():
+    stream, scheduler = session()
+    stream.min_interval = 60
+    decode = Decoder()
+    stream.push((0, 0), decode)
+    stream.push((8, 4), decode)  # The camera moves while the detector runs
+    scheduler.finish([banana([100, 100, 150, 150])])
+    stream.push((16, 8), decode)
+    box = stream.tracks[0]["box"]
+    assert box == pytest.approx([116, 108, 166, 158], abs=1.5)
+
+
+def test_tracks_expire_after_missed_inferences():
+    stream, scheduler = session(max_misses=1)
+    decode = Decoder()
+    stream.push((0, 0), decode)
+    scheduler.finish([banana([10, 10, 50, 50])])
+    for _ in range(3):
+        stream.push((0, 0), decode)  # Collects the last result, submits the next
+        scheduler.finish([])
+    stream.poll()
+    assert stream.tracks == []
+
+
+def test_admission_skips_frames_without_a_slot():
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+    stream, scheduler = session(admission=admission)
+    decode = Decoder()
+    admission.acquire()  # Another request holds the only slot
+    stream.push((0, 0), decode)
+    assert scheduler.submitted == [] and decode.sizes == []
+    admission.release()
+    stream.push((0, 0), decode)
+    assert len(scheduler.submitted) == 1 and admission.in_flight == 1
+    scheduler.finish([])
+    assert admission.in_flight == 0
+
+
+def test_degraded_boxes_are_scaled_back():
+    admission = AdmissionController(max_in_flight=4, max_queue=0, degrade=("size",), degrade_at=0)
+    stream, scheduler = session(admission=admission)
+    decode = Decoder()
+    stream.push((0, 0), decode)
+    assert decode.sizes == [DEGRADED_SIZE]
+    scheduler.finish([banana([10, 10, 20, 20])])
+    stream.poll()
+    scale = SIZE / DEGRADED_SIZE
+    assert stream.tracks[0]["box"] == pytest.approx([10 * scale, 10 * scale, 20 * scale, 20 * scale])
@@ -0,0 +1,47 @@
+import random
+
+from disease_overview.symptom_matcher import SymptomMatcher
+
+DISEASES = {
+    "Flu": {"symptoms": ["Fever", "cough", "body ache", "fatigue"]},
+    "Cold": {"symptoms": ["cough", "runny nose", "sneezing"]},
+    "Migraine": {"symptoms": ["headache", "nausea", "ache"]},
+    "Dengue": {"symptoms": ["fever", "fever", "rash"]},
+}
+
+
+def test_find_matches_substrings():
+    matcher = SymptomMatcher(DISEASES)
+    # "ache" sits inside both "body ache" and "headache"
+    assert matcher.find("Bad HEADACHE and a body ache") == {"headache", "body ache", "ache"}
+    assert matcher.find("") == set()
+    assert matcher.find("nothing relevant") == set()
+
+
+def test_find_agrees_with_substring_scan():
+    matcher = SymptomMatcher(DISEASES)
+    words = ["fever", "cough", "ache", "body", "head", "rash", "nose", "runny", "sneez", "ing", " ", "x"]
+    rng = random.Random(7)
+    for _ in range(200):
+        text = "".join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+        assert matcher.find(text) == {s for s in matcher.symptoms if s in text.lower()}
+
+
+def test_rank_by_coverage():
+    matcher = SymptomMatcher(DISEASES)
+    ranked = matcher.rank("fever and a rash, some cough")
+    assert [m["disease"] for m in ranked] == ["Dengue", "Flu", "Cold"]
+    # Duplicate symptoms count once
+    assert ranked[0] == {"disease": "Dengue", "matched": ["fever", "rash"], "coverage": 1.0}
+    assert ranked[1]["coverage"] == 0.5
+
+
+def test_ties_keep_declaration_order():
+    matcher = SymptomMatcher({"B": {"symptoms": ["itch"]}, "A": {"symptoms": ["itch"]}})
+    assert matcher.search("itch") == {
+        "diseases": ["B", "A"],
+        "matches": [
+            {"disease": "B", "matched": ["itch"], "coverage": 1.0},
+            {"disease": "A", "matched": ["itch"], "coverage": 1.0},
+        ],
+    }
@@ -0,0 +1,81 @@
+import threading
+
+from flask import Flask
+
+from warmup import Lazy, WarmUp, add_ready_route
+
+
+def ready_client(warmup):
+    app = Flask(__name__)
+    add_ready_route(app, warmup)
+    return app.test_client()
+
+
+def test_lazy_builds_once():
+    calls = []
+    lazy = Lazy(lambda: calls.append(1) or len(calls))
+    assert not lazy.loaded
+    threads = [threading.Thread(target=lazy.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert lazy.get() == 1 and calls == [1]
+
+
+def test_ready_after_warm_up():
+    warmup = WarmUp(enabled=True)
+    release = threading.Event()
+    warmup.step("slow")(lambda: release.wait(5))
+    client = ready_client(warmup)
+
+    assert client.get("/ready").status_code == 503
+    warmup.start()
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json["steps"]["slow"]["state"] in ("pending", "running")
+
+    release.set()
+    assert warmup.wait(5)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json["steps"]["slow"]["state"] == "done"
+
+
+def test_failed_step_stays_unready():
+    warmup = WarmUp(enabled=True)
+    ran = []
+
+    @warmup.step("broken")
+    def broken():
+        raise RuntimeError("no model file")
+
+    warmup.step("next")(lambda: ran.append("next"))
+    warmup.start()
+    assert not warmup.wait(5)
+    assert ran == ["next"]  # Later steps still run
+
+    response = ready_client(warmup).get("/ready")
+    assert response.status_code == 503
+    assert response.json["steps"]["broken"] == {"state": "failed", "error": "no model file"}
+
+
+def test_groups_skip_other_processes_steps():
+    warmup = WarmUp(enabled=True, groups="search,")
+    ran = []
+    for name, group in (("medicine", "search"), ("disease", "pdf"), ("shared", None)):
+        warmup.step(name, group=group)(lambda name=name: ran.append(name))
+    warmup.start()
+    assert warmup.wait(5)
+    assert ran == ["medicine", "shared"]
+    assert warmup.status()["steps"]["disease"] == {"state": "skipped"}
+
+
+def test_disabled_is_ready_at_once():
+    warmup = WarmUp(enabled=False)
+    ran = []
+    warmup.step("medicine")(lambda: ran.append(1))
+    warmup.start()
+    assert ready_client(warmup).get("/ready").status_code == 200
+    assert ran == []
+    assert warmup.status()["steps"]["medicine"] == {"state": "skipped"}
@@ -0,0 +1,116 @@
+"""Lazy subsystems, background warm-up and the /ready probe.
+
+A `Lazy` builds its subsystem (the medicine index, the detector, ...) on
+first use instead of at import, so a worker boots in well under a second.
+`WarmUp` then builds them ahead of traffic on a background thread and runs
+a few representative calls (a dummy inference, a search, the PDF text
+cache), so the first real request doesn't pay for it. /ready answers 503
+until every step has finished, for the orchestrator to hold traffic back.
+
+WARMUP=0 skips the warm-up: everything loads on first use and /ready is
+200 straight away. Steps can belong to a route group; with WARMUP_GROUPS set
+(comma-separated, as serve.py does per process) only the steps of those
+groups, and the ungrouped ones, run.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") == "1"
+WARMUP_GROUPS = os.environ.get("WARMUP_GROUPS")  # Unset warms every group
+
+
+class Lazy:
+    """A subsystem built on first use, once, by whichever thread gets there first"""
+
+    def __init__(self, build):
+        self.build = build
+        self.value = None
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def get(self):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    self.value = self.build()
+                    self.loaded = True
+        return self.value
+
+
+class WarmUp:
+    """Named warm-up steps, run in order on one background thread"""
+
+    def __init__(self, enabled=WARMUP_ENABLED, groups=WARMUP_GROUPS):
+        self.enabled = enabled
+        self.groups = None if groups is None else {group for group in groups.split(",") if group}
+        self.steps = []
+        self.state = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.failed = False
+        self.started = False
+
+    def step(self, name, group=None):
+        """Decorator registering a warm-up step, for the routes of `group` if given"""
+        def register(fn):
+            if group is not None and self.groups is not None and group not in self.groups:
+                self.state[name] = {"state": "skipped"}  # Served by another process
+            else:
+                self.steps.append((name, fn))
+                self.state[name] = {"state": "pending"}
+            return fn
+        return register
+
+    def start(self):
+        """Run the steps in the background; a no-op if disabled or already started"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        if not self.enabled:
+            for name, _ in self.steps:
+                self.state[name] = {"state": "skipped"}
+            self.finished.set()
+            return
+        threading.Thread(target=self.run, name="warm-up", daemon=True).start()
+
+    def run(self):
+        for name, fn in self.steps:
+            self.state[name] = {"state": "running"}
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                # Stay unready: an orchestrator should replace this worker
+                logger.exception("Warm-up step %s failed", name)
+                self.state[name] = {"state": "failed", "error": str(e)}
+                self.failed = True
+                continue
+            self.state[name] = {"state": "done", "seconds": round(time.perf_counter() - start, 3)}
+        self.finished.set()
+        logger.info("Warm-up %s: %s", "failed" if self.failed else "finished", self.state)
+
+    @property
+    def ready(self):
+        return self.finished.is_set() and not self.failed
+
+    def wait(self, timeout=None):
+        """Block until the warm-up has run; True if it succeeded"""
+        self.finished.wait(timeout)
+        return self.ready
+
+    def status(self):
+        return {"ready": self.ready, "steps": dict(self.state)}
+
+
+def add_ready_route(app, warmup):
+    @app.route("/ready", methods=["GET"])
+    def ready():
+        """200 once warm-up has finished, 503 (with progress) until then"""
+        return jsonify(warmup.status()), 200 if warmup.ready else 503